@@ -1,45 +1,43 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import re
 import requests
 import json
 import hashlib
-from typing import Optional, Tuple
+from html import escape
+import logging
+import queue
+import threading
+import time
 import numpy as np
-import yfinance as yf
 import calendar
-import unicodedata
-from pandas.tseries.offsets import BDay, MonthEnd
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-from youtubesearchpython import VideosSearch
-import gspread
-from gspread.exceptions import APIError, WorksheetNotFound
-from oauth2client.service_account import ServiceAccountCredentials
+from formatacao import real_br, pct_br
+from carteira import (PARAMS_PADRAO, agrupar_agenda, aplicar_indicadores, consolidar, evolucao_normalizada, extrair_sheet_info,
+                      link_ativo, links_ativos, montar_agenda, montar_fiis, montar_manual, tabela_planilha)
+from carteira import calcular_metricas as motor_metricas
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import medicao
+from medicao import cronometrar, etapa
+import gravacao
+from gravacao import cassete
+# yfinance, plotly, bs4, gspread/oauth2client e youtubesearchpython são importados
+# dentro das funções que os usam: nada disso precisa carregar para a tela de login
 
 # ==========================================
 # ⚙️ CONFIGURAÇÃO
 # ==========================================
 st.set_page_config(page_title="Carteira Pro", layout="wide", page_icon="💠")
+medicao.iniciar("rerun")
 
 MODELO_IA = "gemini-2.5-flash-lite"
 
-# Mapeamento de Colunas (Excel -> Python Index)
-COL_TICKER = 0
-COL_QTD = 5
-COL_PRECO = 8
-COL_PM = 9
-COL_VP = 11
-COL_DY = 17
-COL_DATA_COM = 20
-COL_SETOR = 24
-
 try:
     URL_FIIS = st.secrets["SHEET_URL_FIIS"]
     URL_MANUAL = st.secrets["SHEET_URL_MANUAL"]
     
+    # API de scraping (main.py) opcional: substitui as fórmulas de preço/VP/DY da planilha
+    URL_API = st.secrets["API_FIIS_URL"].rstrip("/") if "API_FIIS_URL" in st.secrets else None
+
     if "LINK_PLANILHA" in st.secrets:
         URL_EDIT = st.secrets["LINK_PLANILHA"]
     else:
@@ -78,6 +76,7 @@ st.markdown("""
     .card-val { font-weight: 700; color: #333; font-size: 0.9rem; }
     
     .opp-footer { margin-top: 12px; background-color: #ccfbf1; color: #0f766e; padding: 6px; border-radius: 6px; font-size: 0.75rem; font-weight: 700; }
+    .ia-footer { margin-top: 8px; background-color: #ede9fe; color: #5b21b6; padding: 6px; border-radius: 6px; font-size: 0.72rem; font-weight: 600; }
     .alert-footer { margin-top: 12px; background-color: #ffccbc; color: #bf360c; padding: 6px; border-radius: 6px; font-size: 0.75rem; font-weight: 700; }
     
     .link-btn { display: block; width: 100%; text-decoration: none; background-color: #fff; border: 1px solid #ccc; color: #555; padding: 6px 0; border-radius: 8px; font-size: 0.8rem; font-weight: 600; transition: all 0.2s; cursor: pointer; text-align: center; }
@@ -94,13 +93,31 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- FUNÇÕES ---
-def real_br(valor): return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if isinstance(valor, (int, float)) else valor
-def pct_br(valor): return f"{valor:.2%}".replace(".", ",") if isinstance(valor, (int, float)) else valor
-def to_f(x): 
-    try: return float(str(x).replace("R$","").replace("%","").replace(" ", "").replace(".", "").replace(",", ".")) if pd.notna(x) else 0.0
-    except: return 0.0
-
-@st.cache_data(ttl=86400)
+def _usuarios_admin():
+    admins = st.secrets.get("ADMIN_USERS", [])
+    if isinstance(admins, str): admins = [a.strip() for a in admins.split(",")]
+    return set(admins)
+
+def painel_desempenho():
+    # Histórico das últimas execuções desta sessão + painel (só para ADMIN_USERS)
+    crono = medicao.finalizar()
+    if crono is None: return
+    historico = st.session_state.setdefault("perf_reruns", [])
+    historico.append(crono)
+    del historico[:-20]
+    if st.session_state.get("auth_user") not in _usuarios_admin(): return
+    with st.sidebar:
+        with st.expander("⏱️ Desempenho (admin)"):
+            st.caption(f"Último rerun: **{crono.total_ms:.0f} ms** • média de {len(historico)} reruns: **{sum(c.total_ms for c in historico) / len(historico):.0f} ms**")
+            linhas = [{"Etapa": e, "Média (ms)": round(m, 1), "Máx (ms)": round(x, 1), "Chamadas": n, "Cache hit": f"{h}/{n}"} for e, m, x, n, h in medicao.agregar(historico)]
+            if linhas: st.dataframe(pd.DataFrame(linhas), hide_index=True, use_container_width=True)
+
+# Fallbacks quando BCB/BrasilAPI falham (nunca gravados como fixture)
+IPCA_PADRAO = 0.045
+SELIC_PADRAO = 0.12
+
+@cronometrar("BCB: IPCA", cache=st.cache_data(ttl=86400))
+@cassete("bcb_ipca", gravar_se=lambda v: v != IPCA_PADRAO)
 def get_ipca_acumulado_12m():
     try:
         url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.433/dados/ultimos/12?formato=json"
@@ -110,9 +127,10 @@ def get_ipca_acumulado_12m():
             for item in dados: acumulado *= (1 + float(item['valor'])/100)
             return acumulado - 1
     except: pass
-    return 0.045
+    return IPCA_PADRAO
 
-@st.cache_data(ttl=86400)
+@cronometrar("BCB: SELIC", cache=st.cache_data(ttl=86400))
+@cassete("bcb_selic", gravar_se=lambda v: v != SELIC_PADRAO)
 def get_selic_meta():
     # Fonte principal: BrasilAPI (taxas/v1)
     try:
@@ -140,9 +158,10 @@ def get_selic_meta():
                 return float(dados[0]["valor"]) / 100
     except Exception:
         pass
-    return 0.12
+    return SELIC_PADRAO
 
-@st.cache_data(ttl=86400)
+@cronometrar("BCB: CDI", cache=st.cache_data(ttl=86400))
+@cassete("bcb_cdi")
 def get_cdi_series(dias=260):
     try:
         url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.4389/dados/ultimos/{dias}?formato=json"
@@ -160,26 +179,46 @@ def get_cdi_series(dias=260):
         pass
     return pd.DataFrame()
 
-@st.cache_data(ttl=300)
+@cronometrar("get_stock_price", cache=st.cache_data(ttl=300))
+@cassete("investidor10_acoes", gravar_se=lambda preco: preco > 0)
 def get_stock_price(ticker):
     try:
         url = f"https://investidor10.com.br/acoes/{ticker.lower()}/"; headers = {'User-Agent': 'Mozilla/5.0'}
         resp = requests.get(url, headers=headers, timeout=5)
         if resp.status_code == 200:
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(resp.text, 'html.parser')
             val = soup.select_one("div._card.cotacao div.value span")
             if val: return float(val.get_text().replace("R$", "").replace(".", "").replace(",", ".").strip())
     except: pass
     return 0.0
 
-@st.cache_data(ttl=3600)
+@cronometrar("API FIIs", cache=st.cache_data(ttl=300, show_spinner=False))
+def buscar_indicadores_api(tickers):
+    # Sem API configurada não há rede: nada a gravar/reproduzir
+    if not URL_API or not tickers: return {}
+    return _consultar_api(tickers)
+
+@cassete("api_fiis")
+def _consultar_api(tickers):
+    def consultar(ticker):
+        try:
+            resp = requests.get(f"{URL_API}/dados/{ticker}", timeout=20)
+            if resp.status_code == 200: return ticker, resp.json()
+        except Exception: pass
+        return ticker, None
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return {t: d for t, d in pool.map(consultar, tickers) if d}
+
+@cronometrar("yf.download (histórico)", cache=st.cache_data(ttl=3600))
 def obter_historico(tickers, periodo="6mo", benchmark="^BVSP"):
     if not tickers: return pd.DataFrame()
     tickers_sa = [f"{t}.SA" if not t.endswith(".SA") else t for t in tickers]
     bench_ticker = "^BVSP" if benchmark == "IBOV" else "IFIX.SA"
     tickers_sa.append(bench_ticker)
     try:
-        dados = yf.download(tickers_sa, period=periodo, progress=False)['Close']
+        import yfinance as yf
+        dados = gravacao.chamar("yf.download", yf.download, tickers_sa, period=periodo, progress=False)['Close']
         if isinstance(dados, pd.Series): dados = dados.to_frame(); dados.columns = tickers_sa
         cols_new = []
         for c in dados.columns:
@@ -191,9 +230,11 @@ def obter_historico(tickers, periodo="6mo", benchmark="^BVSP"):
         return dados
     except: return pd.DataFrame()
 
-@st.cache_data(ttl=86400)
+@cronometrar("YouTube", cache=st.cache_data(ttl=86400))
+@cassete("youtube")
 def buscar_video(ticker):
     try:
+        from youtubesearchpython import VideosSearch
         videosSearch = VideosSearch(f'Análise FII {ticker} vale a pena', limit = 1)
         res = videosSearch.result()
         if res and 'result' in res and len(res['result']) > 0:
@@ -202,79 +243,18 @@ def buscar_video(ticker):
     except: pass
     return None
 
-@st.cache_data(ttl=60)
+@cronometrar("carregar_tudo", cache=st.cache_data(ttl=60))
 def carregar_tudo():
-    dados = []
-    # 1. FIIs
+    partes = []
+    # 1. FIIs — indicadores da API (quando configurada) têm prioridade sobre as fórmulas da planilha
     try:
-        df_fiis = ler_planilha(URL_FIIS, has_header=False)
-        for index, row in df_fiis.iterrows():
-            try:
-                raw = str(row[COL_TICKER]).strip().upper()
-                if not re.match(r'^[A-Z]{4}11[B]?$', raw): continue
-                qtd = to_f(row[COL_QTD])
-                if qtd > 0:
-                    dy_calc = to_f(row[COL_DY]) / 100 if to_f(row[COL_DY]) > 2.0 else to_f(row[COL_DY])
-                    try:
-                        setor = str(row[COL_SETOR]).strip()
-                        if setor == "" or setor.lower() == "nan": setor = "Indefinido"
-                    except: setor = "Indefinido"
-                    try: data_com = str(row[COL_DATA_COM]).strip()
-                    except: data_com = "-"
-                    
-                    dados.append({
-                        "Ativo": raw, "Tipo": "FII", "Setor": setor, "Qtd": qtd,
-                        "Preço Médio": to_f(row[COL_PM]), "Preço Atual": to_f(row[COL_PRECO]),
-                        "VP": to_f(row[COL_VP]), "DY (12m)": dy_calc, "Data Com": data_com,
-                        "Link": f"https://investidor10.com.br/fiis/{raw.lower()}/"
-                    })
-            except: continue
-    except: pass
-
-    # 2. Manual
-    try:
-        df_man = ler_planilha(URL_MANUAL, has_header=True)
-        if len(df_man.columns) >= 4:
-            df_man = df_man.iloc[:, :4]
-            df_man.columns = ["Ativo", "Tipo", "Qtd", "Valor"]
-            for index, row in df_man.iterrows():
-                try:
-                    ativo = str(row["Ativo"]).strip().upper()
-                    if ativo in ["ATIVO", "TOTAL", "", "NAN"]: continue
-                    tipo_raw = str(row["Tipo"]).strip().upper()
-                    qtd = to_f(row["Qtd"]); val_input = to_f(row["Valor"])
-                    tipo = "Outros"; pm = 0.0; pa = val_input; link = None; setor="Ação/Outros"; dcom="-"
-                    if "AÇÃO" in tipo_raw or "ACAO" in tipo_raw:
-                        tipo = "Ação"; pm = val_input
-                        plive = get_stock_price(ativo); pa = plive if plive > 0 else val_input
-                        link = f"https://investidor10.com.br/acoes/{ativo.lower()}/"
-                        setor = "Ações"
-                    else: qtd = 1
-                    dados.append({
-                        "Ativo": ativo, "Tipo": tipo, "Setor": setor, "Qtd": qtd,
-                        "Preço Médio": pm, "Preço Atual": pa, "VP": 0.0, "DY (12m)": 0.0, 
-                        "Data Com": dcom, "Link": link
-                    })
-                except: continue
-    except: pass
-
-    df = pd.DataFrame(dados)
-    if df.empty: return df
-    df = df.drop_duplicates(subset=["Ativo", "Tipo"], keep="first")
-    
-    df["Valor Atual"] = df.apply(lambda x: x["Qtd"] * x["Preço Atual"] if x["Tipo"] in ["FII", "Ação"] else x["Preço Atual"], axis=1)
-    df["Total Investido"] = df.apply(lambda x: x["Qtd"] * x["Preço Médio"] if x["Tipo"] in ["FII", "Ação"] and x["Preço Médio"] > 0 else x["Valor Atual"], axis=1)
-    df["Lucro R$"] = df["Valor Atual"] - df["Total Investido"]
-    df["Renda Mensal"] = df.apply(lambda x: (x["Valor Atual"] * x["DY (12m)"] / 12) if x["Tipo"] == "FII" else 0.0, axis=1)
-    
-    df.replace([np.inf, -np.inf], 0.0, inplace=True)
-    for col in ["Valor Atual", "Total Investido", "Preço Atual", "VP", "DY (12m)", "Renda Mensal", "Lucro R$", "Preço Médio"]:
-        if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-
-    df["P/VP"] = df.apply(lambda x: (x["Preço Atual"] / x["VP"]) if x["VP"] > 0 else 0.0, axis=1)
-    df["Var %"] = df.apply(lambda x: (x["Valor Atual"] / x["Total Investido"] - 1) if x["Total Investido"] > 0 else 0.0, axis=1)
-    df["% Carteira"] = df["Valor Atual"] / df["Valor Atual"].sum() if df["Valor Atual"].sum() > 0 else 0.0
-    return df
+        fiis = montar_fiis(ler_planilha(URL_FIIS, has_header=False))
+        partes.append(aplicar_indicadores(fiis, buscar_indicadores_api(tuple(fiis["Ativo"]))))
+    except Exception: pass
+    # 2. Manual (ações com cotação ao vivo do investidor10)
+    try: partes.append(montar_manual(ler_planilha(URL_MANUAL, has_header=True), get_stock_price))
+    except Exception: pass
+    return consolidar(partes)
 
 MESES_PT = ["", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
 
@@ -286,79 +266,13 @@ PERIODOS_EVOLUCAO = {
     "5 anos": ("5y", 1300)
 }
 
-TIJOLO_KEYWORDS = [
-    "TIJOLO", "LOGIST", "SHOP", "LAJE", "CORPORAT", "RESID", "HOSPITAL", "HOTEL", "EDUC", "AGRO", "IMOBILIARIO URB",
-    "RENDA URB", "DESENV", "MULTIPROPRI", "HÍBRID", "HIBRID", "INDUSTR"
-]
-
-def normalizar_setor(setor):
-    if not setor:
-        return ""
-    texto = unicodedata.normalize('NFD', str(setor))
-    texto = ''.join(ch for ch in texto if unicodedata.category(ch) != 'Mn')
-    return texto.upper().strip()
-
-def setor_eh_tijolo(setor):
-    norm = normalizar_setor(setor)
-    if not norm:
-        return False
-    return any(chave in norm for chave in TIJOLO_KEYWORDS)
-
-def resolver_data_com(valor, referencia=None):
-    if referencia is None:
-        referencia = datetime.now()
-    if pd.isna(valor):
-        return None
-    texto = str(valor).strip()
-    if not texto or texto == "-":
-        return None
-    texto_upper = texto.upper()
-
-    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
-        try:
-            return datetime.strptime(texto, fmt)
-        except ValueError:
-            continue
-
-    if re.match(r"^\d{1,2}/\d{1,2}$", texto):
-        try:
-            dia, mes = map(int, texto.split("/"))
-            ano = referencia.year
-            dt = datetime(ano, mes, dia)
-            if dt.date() < referencia.date():
-                dt = datetime(ano + 1, mes, dia)
-            return dt
-        except ValueError:
-            return None
-
-    ano_ref, mes_ref = referencia.year, referencia.month
-    base_mes = pd.Timestamp(ano_ref, mes_ref, 1)
-
-    match = re.match(r"(\d{1,2})º DIA ÚTIL", texto_upper)
-    if match:
-        try:
-            pos = int(match.group(1))
-            if pos <= 0:
-                return None
-            dt = (base_mes + BDay(pos - 1)).to_pydatetime()
-            return dt
-        except Exception:
-            return None
-
-    if "ÚLTIMO DIA ÚTIL" in texto_upper:
-        dt = (base_mes + MonthEnd(0)).to_pydatetime()
-        while dt.weekday() >= 5:
-            dt = dt - timedelta(days=1)
-        return dt
-
-    return None
-
 def gerar_calendario_dividendos(mapa_dividendos, referencia):
     cal = calendar.Calendar(firstweekday=0)
     semanas = cal.monthdayscalendar(referencia.year, referencia.month)
     dias_semana = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
     dados_z = []
     dados_texto = []
+    rotulos = dict(zip(mapa_dividendos, fmt(list(mapa_dividendos.values()))))
 
     for semana in semanas:
         linha_valores = []
@@ -371,10 +285,11 @@ def gerar_calendario_dividendos(mapa_dividendos, referencia):
                 data_atual = datetime(referencia.year, referencia.month, dia).date()
                 total = mapa_dividendos.get(data_atual, 0.0)
                 linha_valores.append(total if total > 0 else 0.0)
-                linha_textos.append(f"{dia}\n{real_br(total)}" if total > 0 else str(dia))
+                linha_textos.append(f"{dia}\n{rotulos[data_atual]}" if total > 0 else str(dia))
         dados_z.append(linha_valores)
         dados_texto.append(linha_textos)
 
+    import plotly.graph_objects as go
     fig = go.Figure(data=go.Heatmap(
         z=dados_z,
         x=dias_semana,
@@ -399,6 +314,7 @@ def gerar_calendario_dividendos(mapa_dividendos, referencia):
     )
     return fig
 
+@cronometrar("gerar_grafico_evolucao")
 def gerar_grafico_evolucao(df_base, periodo_label, benchmarks):
     if df_base.empty:
         return None
@@ -435,7 +351,9 @@ def gerar_grafico_evolucao(df_base, periodo_label, benchmarks):
         return None
 
     try:
-        dados = yf.download(simbolos_download, period=periodo_yf, progress=False)["Close"]
+        with etapa("yf.download (evolução)"):
+            import yfinance as yf
+            dados = gravacao.chamar("yf.download", yf.download, simbolos_download, period=periodo_yf, progress=False)["Close"]
     except Exception:
         return None
 
@@ -445,59 +363,15 @@ def gerar_grafico_evolucao(df_base, periodo_label, benchmarks):
         return None
 
     rename_map = {**simbolos_mapa, **{sym: nome for nome, sym in bench_map.items()}}
-    dados = dados.rename(columns=rename_map)
-    dados.replace([np.inf, -np.inf], np.nan, inplace=True)
-    dados.sort_index(inplace=True)
-
-    componentes = []
-    for ticker, qtd in quantidades.items():
-        if ticker in dados.columns:
-            serie = dados[ticker].copy().fillna(method="ffill").fillna(method="bfill")
-            componentes.append(serie * qtd)
-
-    if not componentes:
-        return None
-
-    carteira_series = pd.concat(componentes, axis=1).sum(axis=1).replace([np.inf, -np.inf], np.nan).dropna()
-    if carteira_series.empty:
-        return None
-
-    plot_df = pd.DataFrame(index=carteira_series.index)
-    plot_df["Carteira"] = carteira_series
-
-    for bench_nome in bench_map.keys():
-        if bench_nome in dados.columns:
-            serie_bench = dados[bench_nome].reindex(plot_df.index).fillna(method="ffill").dropna()
-            if not serie_bench.empty:
-                plot_df[bench_nome] = serie_bench
-
+    cdi_acumulado = None
     if "CDI" in benchmarks:
         cdi_df = get_cdi_series(dias_cdi)
-        if not cdi_df.empty:
-            cdi_series = cdi_df.set_index("data")["acum"].reindex(plot_df.index, method="ffill").dropna()
-            if not cdi_series.empty:
-                plot_df["CDI"] = cdi_series
-
-    plot_df.dropna(how="all", inplace=True)
-    if plot_df.empty:
-        return None
-
-    plot_norm = pd.DataFrame(index=plot_df.index)
-    for coluna in plot_df.columns:
-        serie = plot_df[coluna].copy().fillna(method="ffill")
-        serie.dropna(inplace=True)
-        if serie.empty:
-            continue
-        base = serie.iloc[0]
-        if base == 0:
-            continue
-        normalizada = (serie / base - 1) * 100
-        normalizada = normalizada.reindex(plot_df.index).fillna(method="ffill")
-        plot_norm[coluna] = normalizada
-
+        if not cdi_df.empty: cdi_acumulado = cdi_df.set_index("data")["acum"]
+    plot_norm = evolucao_normalizada(dados.rename(columns=rename_map), quantidades, list(bench_map), cdi_acumulado)
     if plot_norm.empty:
         return None
 
+    import plotly.graph_objects as go
     fig = go.Figure()
     for coluna in plot_norm.columns:
         fig.add_trace(go.Scatter(x=plot_norm.index, y=plot_norm[coluna], mode="lines", name=coluna))
@@ -514,13 +388,23 @@ def gerar_grafico_evolucao(df_base, periodo_label, benchmarks):
     fig.update_traces(hovertemplate="%{y:.1f}%")
     return fig
 
+# --- MÉTRICAS DERIVADAS (calculadas uma vez por versão dos dados + parâmetros) ---
+@cronometrar("calcular_metricas", cache=st.cache_data(ttl=3600, max_entries=32, show_spinner=False))
+def calcular_metricas(df_base, ipca_atual, selic_atual, params_itens):
+    # st.cache_data é o backend de cache do app; a conta em si fica no motor (carteira.py)
+    return motor_metricas(df_base, ipca_atual, selic_atual, dict(params_itens))
+
 # --- SALVAMENTO (COM CORREÇÃO DE ERRO JSON) ---
+@cronometrar("salvar_snapshot_google")
 def salvar_snapshot_google(df, patrimonio, investido):
+    if gravacao.sem_rede(): return True, "✅ Modo reproduzir: snapshot não enviado ao Google Sheets"
     try:
         # 1. Autenticação (AQUI ESTÁ A CORREÇÃO: strict=False)
         creds_json = json.loads(st.secrets["GOOGLE_CREDENTIALS"], strict=False)
         
         scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/spreadsheets', "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
         creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, scope)
         client = gspread.authorize(creds)
         
@@ -543,7 +427,7 @@ def salvar_snapshot_google(df, patrimonio, investido):
         agora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
         worksheet.update('A1', [['Atualizado em', 'Patrimonio', 'Investido'], [agora, float(patrimonio), float(investido)]])
         
-        df_export = df[['Ativo', 'Tipo', 'Preço Atual', 'Valor Atual', 'P/VP', 'DY (12m)', 'Setor']].copy()
+        df_export = df[['Ativo', 'Tipo', 'Preço Atual', 'Valor Atual', 'P/VP', 'DY (12m)', 'Setor']].astype({'Tipo': str, 'Setor': str})
         df_export = df_export.fillna(0)
         dados_lista = [df_export.columns.values.tolist()] + df_export.values.tolist()
         worksheet.update('A4', dados_lista)
@@ -551,21 +435,167 @@ def salvar_snapshot_google(df, patrimonio, investido):
         return True, f"✅ Dados sincronizados com sucesso às {agora}"
     except Exception as e: return False, f"❌ Erro Técnico: {str(e)}"
 
+# --- IA (GEMINI) ---
+@cassete("gemini")
+def _chamar_gemini(prompt, json_mode=False):
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELO_IA}:generateContent?key={API_KEY}"
+    data = {"contents": [{"parts": [{"text": prompt}]}]}
+    if json_mode: data["generationConfig"] = {"responseMimeType": "application/json", "temperature": 0.2}
+    resp = requests.post(url, headers={'Content-Type': 'application/json'}, data=json.dumps(data), timeout=60)
+    if resp.status_code != 200:
+        raise RuntimeError(f"Erro IA ({resp.status_code})")
+    return resp.json()['candidates'][0]['content']['parts'][0]['text']
+
+def montar_payload_carteira(df_base):
+    # Uma linha compacta por FII (ticker;pvp;dy;setor;peso) para caber tudo num único prompt
+    fiis = df_base[df_base["Tipo"] == "FII"].sort_values("% Carteira", ascending=False)
+    linhas = ["ticker;pvp;dy;setor;peso"]
+    for _, row in fiis.iterrows():
+        setor = str(row["Setor"]).replace(";", ",")
+        linhas.append(f"{row['Ativo']};{row['P/VP']:.2f};{row['DY (12m)'] * 100:.1f};{setor};{row['% Carteira'] * 100:.1f}")
+    return "\n".join(linhas)
+
+@cronometrar("Gemini: carteira", cache=st.cache_data(ttl=21600, show_spinner=False))
+def analisar_carteira_ia(payload):
+    # Cache pelo próprio payload: mesma carteira = zero chamadas novas
+    prompt = f"""Você é um analista de FIIs. Avalie cada fundo da carteira abaixo (dy e peso em %).
+{payload}
+
+Responda APENAS com JSON no formato:
+{{"resumo": "diagnóstico geral em até 3 frases",
+ "ativos": [{{"ticker": "XXXX11", "veredito": "Comprar|Manter|Reduzir", "motivo": "até 15 palavras"}}]}}
+Inclua todos os tickers listados."""
+    bruto = _chamar_gemini(prompt, json_mode=True)
+    bruto = bruto.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+    resposta = json.loads(bruto)
+    vereditos = {}
+    for item in resposta.get("ativos", []):
+        ticker = str(item.get("ticker", "")).strip().upper()
+        if ticker:
+            vereditos[ticker] = {"veredito": str(item.get("veredito", "-")), "motivo": str(item.get("motivo", ""))}
+    return {"resumo": str(resposta.get("resumo", "")), "ativos": vereditos}
+
+@cronometrar("Gemini: ativo", cache=st.cache_data(ttl=21600, show_spinner=False))
+def analisar_ativo_ia(prompt):
+    return _chamar_gemini(prompt)
+
+def veredito_ia(ativo):
+    return st.session_state.get("ia_carteira", {}).get("ativos", {}).get(ativo)
+
+def html_veredito(ativo):
+    v = veredito_ia(ativo)
+    if not v: return ""
+    # Texto livre do modelo vai para st.markdown com HTML liberado: escapado
+    return f'<div class="ia-footer">🤖 {escape(str(v["veredito"]))}: {escape(str(v["motivo"]))}</div>'
+
+@st.dialog("✨ IA Geral da Carteira", width="large")
+def modal_ia_geral(df_base):
+    if not HAS_AI: st.error("Sem API Key"); return
+    payload = montar_payload_carteira(df_base)
+    if payload.count("\n") == 0: st.info("Nenhum FII na carteira."); return
+    with st.spinner("Analisando a carteira inteira numa única chamada..."):
+        try:
+            resultado = analisar_carteira_ia(payload)
+        except Exception as e:
+            st.error(str(e)); return
+    st.session_state["ia_carteira"] = resultado
+    if resultado["resumo"]: st.markdown(resultado["resumo"])
+    tabela = pd.DataFrame([{"Ativo": t, "Veredito": v["veredito"], "Motivo": v["motivo"]} for t, v in resultado["ativos"].items()])
+    if not tabela.empty: st.dataframe(tabela, use_container_width=True, hide_index=True)
+
+# --- AUTO-SAVE EM SEGUNDO PLANO ---
+# Um único worker por processo (compartilhado entre sessões): fila limitada, uma escrita
+# pendente por planilha (a versão mais nova substitui a que ainda não começou) e
+# nada é reenviado se o conteúdo for igual ao último salvo há pouco.
+SNAPSHOT_FILA_MAX = 8
+SNAPSHOT_JANELA_DEDUP = 300
+SNAPSHOT_REENVIO = 60  # segundos até tentar de novo após falha ou fila cheia
+COLS_SNAPSHOT = ['Ativo', 'Tipo', 'Preço Atual', 'Valor Atual', 'P/VP', 'DY (12m)', 'Setor']
+
+class SnapshotWorker:
+    def __init__(self):
+        self.fila = queue.Queue(maxsize=SNAPSHOT_FILA_MAX)
+        self.lock = threading.Lock()
+        self.pendentes = {}   # chave -> (geração, payload)
+        self.geracao = {}     # chave -> última geração enviada
+        self.concluidos = {}  # chave -> (geração, sucesso, mensagem)
+        self.assinaturas = {} # chave -> (hash do conteúdo, instante)
+        threading.Thread(target=self._loop, name="snapshot-worker", daemon=True).start()
+
+    def enviar(self, chave, df_base, patrimonio, investido):
+        assinatura = hashlib.sha1((df_base[COLS_SNAPSHOT].to_csv(index=False) + f"{patrimonio:.2f}|{investido:.2f}").encode("utf-8")).hexdigest()
+        with self.lock:
+            anterior = self.assinaturas.get(chave)
+            if anterior and anterior[0] == assinatura and time.time() - anterior[1] < SNAPSHOT_JANELA_DEDUP:
+                return self.concluidos[chave][0]
+            payload = (df_base[COLS_SNAPSHOT].copy(), patrimonio, investido, assinatura)
+            if chave in self.pendentes:
+                geracao = self.pendentes[chave][0]
+                self.pendentes[chave] = (geracao, payload)
+                return geracao
+            geracao = self.geracao.get(chave, 0) + 1
+            try: self.fila.put_nowait(chave)
+            except queue.Full: return None
+            self.geracao[chave] = geracao
+            self.pendentes[chave] = (geracao, payload)
+            return geracao
+
+    def consultar(self, chave, geracao):
+        with self.lock:
+            feito = self.concluidos.get(chave)
+        if feito and feito[0] >= geracao: return feito[1], feito[2]
+        return None
+
+    def _loop(self):
+        while True:
+            chave = self.fila.get()
+            with self.lock:
+                geracao, (df_base, patrimonio, investido, assinatura) = self.pendentes.pop(chave)
+            t0 = time.perf_counter()
+            try: sucesso, msg = salvar_snapshot_google(df_base, patrimonio, investido)
+            except Exception as e: sucesso, msg = False, str(e)
+            logging.getLogger("carteira.snapshot").info(f"snapshot {chave[:12]} ger={geracao} ok={sucesso} {(time.perf_counter() - t0) * 1000:.0f}ms")
+            with self.lock:
+                self.concluidos[chave] = (geracao, sucesso, msg)
+                if sucesso: self.assinaturas[chave] = (assinatura, time.time())
+
+@st.cache_resource
+def _snapshot_worker():
+    return SnapshotWorker()
+
+def _chave_snapshot():
+    return str(st.secrets["SHEET_ID"]) if "SHEET_ID" in st.secrets else str(st.secrets["SHEET_URL_FIIS"])
+
+@st.fragment(run_every=2)
+def acompanhar_snapshot():
+    pendente = st.session_state.get("snapshot_pendente")
+    if not pendente: return
+    resultado = _snapshot_worker().consultar(*pendente)
+    if resultado is None: return
+    st.session_state.pop("snapshot_pendente", None)
+    sucesso, msg = resultado
+    if sucesso:
+        st.session_state['dados_salvos'] = True
+        st.session_state['snapshot_aviso'] = ("✅ Dados atualizados na nuvem!", "☁️")
+    else:
+        st.session_state['snapshot_tentar_apos'] = time.time() + SNAPSHOT_REENVIO
+        st.session_state['snapshot_aviso'] = (f"Falha Auto-Save: {msg}", "⚠️")
+    # Rerun completo: sem "snapshot_pendente" o fragmento deixa de ser montado e o polling para
+    st.rerun()
+
 @st.dialog("🤖 Análise Inteligente", width="large")
 def modal_analise(ativo, tipo_analise, **kwargs):
     st.empty()
     prompt = f"Analise {ativo}. {kwargs}"
     if not HAS_AI: st.error("Sem API Key"); return
+    v = veredito_ia(ativo)
+    if v:
+        st.markdown(f"**Veredito da IA Geral:** {v['veredito']} — {v['motivo']}")
     with st.spinner(f"Analisando {ativo}..."):
         try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELO_IA}:generateContent?key={API_KEY}"
-            data = {"contents": [{"parts": [{"text": prompt}]}]}
-            resp = requests.post(url, headers={'Content-Type': 'application/json'}, data=json.dumps(data))
-            if resp.status_code == 200:
-                txt = resp.json()['candidates'][0]['content']['parts'][0]['text']
-                st.markdown(txt)
-                st.caption("Copiar análise:"); st.code(txt, language=None)
-            else: st.error("Erro IA")
+            txt = analisar_ativo_ia(prompt)
+            st.markdown(txt)
+            st.caption("Copiar análise:"); st.code(txt, language=None)
         except Exception as e: st.error(str(e))
     st.divider(); st.subheader("📺 Vídeo Relacionado")
     with st.spinner("Buscando..."):
@@ -574,8 +604,17 @@ def modal_analise(ativo, tipo_analise, **kwargs):
         else: st.info("Sem vídeo."); st.link_button("YouTube", f"https://www.youtube.com/results?search_query=analise+{ativo}")
 
 def fmt(valor, prefix="R$ ", is_pct=False):
-    if st.session_state.get('privacy_mode'): return "••••••"
-    return pct_br(valor) if is_pct else real_br(valor)
+    # Aceita valor solto ou coluna inteira (formatada em lote)
+    privado = bool(st.session_state.get('privacy_mode'))
+    return pct_br(valor, privado) if is_pct else real_br(valor, privado)
+
+def textos_cards(df_cards):
+    # Valores dos cards formatados coluna a coluna (uma passada por coluna)
+    reais = [c for c in ("Preço Atual", "Preço Médio", "Valor Atual", "AporteSugerido") if c in df_cards.columns]
+    pcts = [c for c in ("DY (12m)", "% Carteira") if c in df_cards.columns]
+    textos = {c: fmt(df_cards[c]) for c in reais}
+    textos.update({c: fmt(df_cards[c], is_pct=True) for c in pcts})
+    return pd.DataFrame(textos, index=df_cards.index)
 
 def _hash_password(valor):
     return hashlib.sha256(valor.encode("utf-8")).hexdigest()
@@ -615,30 +654,7 @@ def _carregar_credenciais():
             return cred_map
     return {}
 
-def _extrair_sheet_info(url: str) -> Tuple[Optional[str], Optional[int]]:
-    if not url:
-        return None, None
-    sheet_id = None
-    if "/d/" in url:
-        try:
-            parte = url.split("/d/")[1]
-            if parte.startswith("e/"):
-                parte = parte.split("/", 2)[1] if "/" in parte[2:] else parte[2:]
-            sheet_id = parte.split("/")[0]
-        except Exception:
-            sheet_id = None
-    if sheet_id is None:
-        sheet_id = url
-    gid = None
-    match = re.search(r"gid=(\d+)", url)
-    if match:
-        try:
-            gid = int(match.group(1))
-        except Exception:
-            gid = None
-    return sheet_id, gid
-
-@st.cache_resource
+@cronometrar("Sheets: auth", cache=st.cache_resource)
 def _get_gspread_client():
     try:
         creds_json = json.loads(st.secrets["GOOGLE_CREDENTIALS"], strict=False)
@@ -650,11 +666,14 @@ def _get_gspread_client():
         "https://www.googleapis.com/auth/drive.file",
         "https://www.googleapis.com/auth/drive"
     ]
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
     creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, scope)
     return gspread.authorize(creds)
 
 def _carregar_worksheet(url: str):
-    sheet_id, gid = _extrair_sheet_info(url)
+    from gspread.exceptions import APIError, WorksheetNotFound
+    sheet_id, gid = extrair_sheet_info(url)
     if not sheet_id:
         return None
     client = _get_gspread_client()
@@ -684,7 +703,10 @@ def _carregar_worksheet(url: str):
         st.error(f"Não foi possível obter a primeira aba da planilha: {exc}")
         st.stop()
 
+@cronometrar("Sheets: ler_planilha")
+@cassete("google_sheets")
 def ler_planilha(url: str, has_header: bool = False) -> pd.DataFrame:
+    from gspread.exceptions import APIError
     worksheet = _carregar_worksheet(url)
     if worksheet is None:
         st.error("Não foi possível localizar a worksheet alvo.")
@@ -701,11 +723,7 @@ def ler_planilha(url: str, has_header: bool = False) -> pd.DataFrame:
     if not valores:
         st.warning("A planilha está vazia.")
         return pd.DataFrame()
-    df = pd.DataFrame(valores)
-    if has_header and not df.empty:
-        df.columns = df.iloc[0]
-        df = df.drop(df.index[0])
-    return df.reset_index(drop=True)
+    return tabela_planilha(valores, has_header)
 
 def _credenciais_validas(usuario, senha):
     credenciais = _carregar_credenciais()
@@ -752,6 +770,202 @@ def garantir_login():
                 st.error("Credenciais inválidas. Tente novamente.")
     st.stop()
 
+# --- ABAS (renderização sob demanda) ---
+# Só a seção escolhida executa; cada uma é um fragmento, então os widgets
+# internos (mês da agenda, ativos do histórico...) reexecutam apenas ela.
+
+# Tabelas com formatação nativa (column_config) em vez do Styler, que gera o HTML
+# de cada célula no servidor; as cores viram colunas/barras pré-calculadas.
+COL_REAL = st.column_config.NumberColumn(format="R$ %.2f")
+
+def _em_percentual(tabela, colunas):
+    tabela = tabela.copy()
+    presentes = [c for c in colunas if c in tabela.columns]
+    tabela[presentes] = tabela[presentes] * 100
+    return tabela
+
+def _teto(serie):
+    maximo = serie.max() if serie is not None else None
+    return float(maximo) if pd.notna(maximo) and maximo > 0 else 1.0
+
+def _privacidade(tabela, config, colunas):
+    # Modo privacidade: colunas da posição viram texto mascarado (em lote)
+    if st.session_state.get('privacy_mode'):
+        for c in colunas:
+            if c in tabela.columns:
+                tabela[c] = fmt(tabela[c])
+                config[c] = st.column_config.TextColumn(config[c].get("label") if c in config else None)
+    return config
+
+@st.fragment
+def aba_setorial(df, metricas): # GRÁFICO SETORIAL
+    import plotly.express as px
+    c1, c2 = st.columns(2)
+    with c1:
+        # plotly agrega as colunas do path: categorias viram texto só aqui
+        fig = px.sunburst(df.astype({'Tipo': str, 'Setor': str}), path=['Tipo', 'Setor', 'Ativo'], values='Valor Atual', color='Setor', title="Diversificação por Setor")
+        st.plotly_chart(fig, use_container_width=True)
+    with c2:
+        top_s = metricas["setores"]
+        fig2 = px.bar(top_s, x="Valor Atual", y="Setor", orientation='h', title="Exposição por Setor")
+        st.plotly_chart(fig2, use_container_width=True)
+
+
+@st.fragment
+def aba_matriz(df, metricas): # MATRIZ + TABELA
+    import plotly.express as px
+    st.subheader("Matriz de Valor (FIIs)")
+    df_fii = metricas["df_fii"]
+    if not df_fii.empty:
+        fig = px.scatter(df_fii, x="P/VP", y="DY (12m)", size="Valor Atual", color="Ativo", text="Ativo", template="plotly_white")
+        fig.add_shape(type="rect", x0=0, y0=metricas["media_dy"], x1=1.0, y1=df_fii["DY (12m)"].max()*1.1, fillcolor="rgba(0, 200, 83, 0.1)", line=dict(width=0), layer="below")
+        fig.add_vline(x=1.0, line_dash="dot", line_color="gray"); st.plotly_chart(fig, use_container_width=True)
+    st.divider(); st.subheader("🔥 Melhores Descontos")
+    df_radar = metricas["df_radar"]
+    if not df_radar.empty:
+        cols_descontos = ["Ativo", "Preço Atual", "P/VP", "DY (12m)", "Valor Atual", "% Carteira"]
+        tabela_descontos = _em_percentual(df_radar[cols_descontos], ["DY (12m)", "% Carteira"])
+        tabela_descontos.insert(0, "Faixa", np.select([tabela_descontos["P/VP"] < 0.9, tabela_descontos["P/VP"] < 1.0], ["🟢", "🟡"], "🔴"))
+        st.dataframe(
+            tabela_descontos,
+            column_config=_privacidade(tabela_descontos, {
+                "Faixa": st.column_config.TextColumn(" ", help="P/VP: 🟢 abaixo de 0,90 • 🟡 abaixo de 1,00 • 🔴 1,00 ou mais"),
+                "Preço Atual": COL_REAL, "Valor Atual": COL_REAL,
+                "P/VP": st.column_config.NumberColumn(format="%.2f"),
+                "DY (12m)": st.column_config.ProgressColumn("DY (12m)", format="%.2f%%", min_value=0.0, max_value=_teto(tabela_descontos["DY (12m)"])),
+                "% Carteira": st.column_config.ProgressColumn("% Carteira", format="%.2f%%", min_value=0.0, max_value=_teto(tabela_descontos["% Carteira"]))
+            }, ["Valor Atual"]),
+            use_container_width=True
+        )
+
+
+@st.fragment
+def aba_inventario(df, metricas): # INVENTÁRIO
+    cols_show = ["Ativo", "Segmento", "Setor", "Preço Médio", "Preço Atual", "Qtd", "Valor Atual", "Var %", "DY (12m)", "% Carteira", "Renda Mensal"]
+    df_inv = df[[c for c in cols_show if c in df.columns]].copy()
+    df_inv["Ficha"] = links_ativos(df)
+    ordem_cols = ["Ficha", "Ativo", "Segmento", "Setor", "Preço Médio", "Preço Atual", "Qtd", "Valor Atual", "Var %", "DY (12m)", "% Carteira", "Renda Mensal"]
+    df_inv = _em_percentual(df_inv[[c for c in ordem_cols if c in df_inv.columns]], ["Var %", "DY (12m)", "% Carteira"])
+    if "Var %" in df_inv.columns:
+        df_inv.insert(df_inv.columns.get_loc("Var %"), "±", np.select([df_inv["Var %"] > 0, df_inv["Var %"] < 0], ["🟢", "🔴"], "⚪"))
+    st.dataframe(
+        df_inv,
+        column_config=_privacidade(df_inv, {
+            "Ficha": st.column_config.LinkColumn(" ", display_text="🔗", help="Abrir detalhes do ativo"),
+            "Preço Médio": COL_REAL, "Preço Atual": COL_REAL, "Valor Atual": COL_REAL, "Renda Mensal": COL_REAL,
+            "Qtd": st.column_config.NumberColumn(format="%.0f"),
+            "±": st.column_config.TextColumn(" ", help="Valorização sobre o preço médio"),
+            "Var %": st.column_config.NumberColumn(format="%.2f%%"),
+            "DY (12m)": st.column_config.ProgressColumn("DY (12m)", format="%.2f%%", min_value=0.0, max_value=_teto(df_inv.get("DY (12m)"))),
+            "% Carteira": st.column_config.ProgressColumn("Peso", format="%.2f%%", min_value=0.0, max_value=100.0)
+        }, ["Preço Médio", "Qtd", "Valor Atual", "Renda Mensal"]),
+        height=600
+    )
+
+
+@st.fragment
+def aba_agenda(df, metricas): # AGENDA
+    st.subheader("📅 Status dos Dividendos (Data Com)")
+    hoje = datetime.now()
+    tem_datas = ((df["Tipo"]=="FII") & (df["Data Com"] != "-")).any()
+    df_ag = montar_agenda(df, hoje)
+    if not tem_datas:
+        st.info("Nenhuma data encontrada.")
+    else:
+        if df_ag.empty:
+            st.info("Não foi possível estimar as datas de corte para os registros atuais.")
+        else:
+            df_ag["Ficha"] = links_ativos(df_ag)
+
+            meses_disponiveis = sorted(df_ag["Mês"].unique())
+            mes_atual = pd.Period(hoje, freq="M")
+            mes_default = mes_atual if mes_atual in meses_disponiveis else meses_disponiveis[0]
+            mes_escolhido = st.selectbox(
+                "Mês de referência",
+                options=meses_disponiveis,
+                index=meses_disponiveis.index(mes_default) if mes_default in meses_disponiveis else 0,
+                format_func=lambda p: f"{MESES_PT[p.month]} / {p.year}"
+            )
+
+            ref_data = datetime(mes_escolhido.year, mes_escolhido.month, 1)
+            df_ag_mes = df_ag[df_ag["Mês"] == mes_escolhido].copy().sort_values("Data Prevista")
+            if df_ag_mes.empty:
+                st.info("Sem eventos para o mês selecionado.")
+            else:
+                total_mes = df_ag_mes["Dividendo Estimado"].sum()
+                if mes_escolhido == mes_atual:
+                    total_passado = df_ag_mes[df_ag_mes["Data Prevista"].dt.date <= hoje.date()]["Dividendo Estimado"].sum()
+                else:
+                    total_passado = 0.0
+                total_pendente = total_mes - total_passado
+
+                c_met1, c_met2, c_met3 = st.columns(3)
+                c_met1.metric("Previsto no mês", fmt(total_mes))
+                c_met2.metric("Já passou", fmt(total_passado))
+                c_met3.metric("Ainda por vir", fmt(max(total_pendente, 0.0)))
+
+                st.markdown("### 🗓️ Calendário do mês")
+                mapa_dividendos, df_tot_data, df_tot_ativo = agrupar_agenda(df_ag_mes)
+                st.plotly_chart(gerar_calendario_dividendos(mapa_dividendos, ref_data), use_container_width=True)
+
+                st.markdown("### 📌 Agenda detalhada")
+                agenda_view = df_ag_mes[["Ativo", "Data Com", "Data Prevista", "Status", "Dividendo Estimado", "Ficha"]].copy()
+                agenda_view["Data Prevista"] = agenda_view["Data Prevista"].dt.date
+                st.dataframe(
+                    agenda_view,
+                    column_config=_privacidade(agenda_view, {
+                        "Data Prevista": st.column_config.DateColumn("Data Com"),
+                        "Dividendo Estimado": st.column_config.NumberColumn("Dividendo Estimado", format="R$ %.2f"),
+                        "Ficha": st.column_config.LinkColumn(" ", display_text="🔗", help="Abrir detalhes do ativo")
+                    }, ["Dividendo Estimado"]),
+                    use_container_width=True
+                )
+
+                st.markdown("### 📅 Totais por data")
+                df_tot_data["Data Prevista"] = df_tot_data["Data Prevista"].dt.date
+                st.dataframe(
+                    df_tot_data,
+                    column_config=_privacidade(df_tot_data, {
+                        "Data Prevista": st.column_config.DateColumn("Data"),
+                        "Dividendo Estimado": st.column_config.NumberColumn("Total", format="R$ %.2f")
+                    }, ["Dividendo Estimado"]),
+                    use_container_width=True
+                )
+
+                st.markdown("### 💸 Totais por ativo")
+                st.dataframe(
+                    df_tot_ativo,
+                    column_config=_privacidade(df_tot_ativo, {
+                        "Dividendo Estimado": st.column_config.NumberColumn("Total", format="R$ %.2f")
+                    }, ["Dividendo Estimado"]),
+                    use_container_width=True
+                )
+
+
+@st.fragment
+def aba_historico(df, metricas): # HISTÓRICO
+    st.subheader("📈 Rentabilidade Relativa")
+    ativos = df[df["Tipo"].isin(["FII", "Ação"])]["Ativo"].tolist()
+    if ativos:
+        c_sel, c_p, c_b = st.columns([2, 1, 1])
+        with c_sel: sel = st.multiselect("Ativos:", ativos, default=ativos[:3])
+        with c_p: per = st.selectbox("Prazo:", ["1mo", "6mo", "1y", "5y"], index=1)
+        with c_b: bench = st.selectbox("Benchmark:", ["IBOV", "IFIX"], index=0)
+        if sel:
+            with st.spinner("..."):
+                hist = obter_historico(sel, per, bench)
+            if not hist.empty: st.line_chart((hist/hist.iloc[0]-1)*100)
+
+
+ABAS = {
+    "📊 Visão Setorial": aba_setorial,
+    "🎯 Matriz & Radar": aba_matriz,
+    "📋 Inventário": aba_inventario,
+    "📅 Agenda": aba_agenda,
+    "📈 Histórico": aba_historico,
+}
+
+
 # --- APP ---
 garantir_login()
 c1, c2 = st.columns([6, 1])
@@ -760,8 +974,6 @@ with c2:
     if st.button("↻ Atualizar"): st.cache_data.clear(); st.rerun()
 
 df = carregar_tudo()
-if not df.empty:
-    df["Segmento"] = df["Setor"].apply(lambda x: "Tijolo" if setor_eh_tijolo(x) else "Papéis")
 
 with st.sidebar:
     st.header("Ferramentas")
@@ -780,15 +992,7 @@ with st.sidebar:
     st.caption(f"IPCA (12m): **{ipca_atual:.2%}** (BCB)")
     st.caption(f"SELIC oficial: **{selic_atual:.2%}** (fonte automática)")
 
-    params_defaults = {
-        "selic_custom": selic_atual,
-        "opp_pvp_min": 0.80,
-        "opp_pvp_max": 0.99,
-        "opp_dy_min": 0.12,
-        "opp_aporte_min": 1000.0,
-        "radar_tijolo_pct": 0.60,
-        "radar_outros_pct": 0.80,
-    }
+    params_defaults = {**PARAMS_PADRAO, "selic_custom": selic_atual}
     if 'user_params' not in st.session_state: st.session_state['user_params'] = params_defaults.copy()
     else:
         for chave, val in params_defaults.items():
@@ -870,46 +1074,33 @@ with st.sidebar:
         params['radar_outros_pct'] = outros_pct_input / 100 if outros_pct_input else 0.0
     
     st.divider()
-    if not df.empty and st.button("✨ IA Geral", type="primary", use_container_width=True): pass
+    if not df.empty and st.button("✨ IA Geral", type="primary", use_container_width=True): modal_ia_geral(df)
 
 if not df.empty:
-    patr = df["Valor Atual"].sum()
-    renda_nominal = df["Renda Mensal"].sum()
-    investido = df["Total Investido"].sum()
-    selic_utilizada = params['selic_custom'] if params.get('selic_custom', 0) > 0 else selic_atual
-    
-    # --- CÁLCULO DA REALIDADE (Ajuste de Inflação) ---
-    # 1. Converter IPCA anual para mensal (Juros Compostos)
-    ipca_mensal = ((1 + ipca_atual) ** (1/12)) - 1
-    
-    # 2. Quanto do dividendo deve ser REINVESTIDO obrigatoriamente para manter o poder de compra do principal
-    custo_manutencao_patrimonio = patr * ipca_mensal
-    
-    # 3. Renda Real (O que sobra para gastar sem corroer o patrimônio)
-    renda_real_disponivel = renda_nominal - custo_manutencao_patrimonio
-    
-    # 4. Yield Real Anualizado (Métrica percentual ajustada)
-    # Fórmula de Fisher aproximada para o todo: ((1 + Yield_Nominal) / (1 + Inflação)) - 1
-    yield_nominal_anual = (renda_nominal * 12) / patr if patr > 0 else 0
-    yield_real_perc = ((1 + yield_nominal_anual) / (1 + ipca_atual)) - 1
-
-    # --- MÉTRICAS DE CARTEIRA ---
-    val_rs = patr - investido
-    val_pct = val_rs / investido if investido > 0 else 0
-    fiis_total = df[df["Tipo"]=="FII"]["Valor Atual"].sum()
-    acoes_total = df[df["Tipo"]=="Ação"]["Valor Atual"].sum()
-    renda_variavel_total = fiis_total + acoes_total
-    outros_total = max(patr - renda_variavel_total, 0.0)
+    # Recalculado só quando os dados (carregar_tudo) ou os parâmetros mudam; widgets
+    # como privacidade/período reaproveitam o resultado em cache
+    metricas = calcular_metricas(df, ipca_atual, selic_atual, tuple(sorted(params.items())))
+    patr, renda_nominal, investido = metricas["patr"], metricas["renda_nominal"], metricas["investido"]
+    selic_utilizada = metricas["selic_utilizada"]
+    custo_manutencao_patrimonio = metricas["custo_manutencao_patrimonio"]
+    renda_real_disponivel = metricas["renda_real_disponivel"]
+    yield_real_perc = metricas["yield_real_perc"]
+    val_rs, val_pct = metricas["val_rs"], metricas["val_pct"]
+    renda_variavel_total, outros_total = metricas["renda_variavel_total"], metricas["outros_total"]
     cls_val = "pos" if val_rs >= 0 else "neg"; sinal = "+" if val_rs >= 0 else ""
 
-    # --- AUTO-SAVE (Mantedo sua lógica) ---
-    if 'dados_salvos' not in st.session_state:
-        with st.spinner("Sincronizando dados com o Robô..."):
-            sucesso, msg = salvar_snapshot_google(df, patr, investido)
-            if sucesso:
-                st.session_state['dados_salvos'] = True
-                st.toast("✅ Dados atualizados na nuvem!", icon="☁️")
-            else: st.error(f"Falha Auto-Save: {msg}")
+    # --- AUTO-SAVE (em segundo plano: não bloqueia a primeira renderização) ---
+    aviso = st.session_state.pop('snapshot_aviso', None)
+    if aviso: st.toast(aviso[0], icon=aviso[1])
+    if ('dados_salvos' not in st.session_state and 'snapshot_pendente' not in st.session_state
+            and time.time() >= st.session_state.get('snapshot_tentar_apos', 0)):
+        chave_snap = _chave_snapshot()
+        geracao = _snapshot_worker().enviar(chave_snap, df, patr, investido)
+        if geracao is not None: st.session_state['snapshot_pendente'] = (chave_snap, geracao)
+        else:
+            st.session_state['snapshot_tentar_apos'] = time.time() + SNAPSHOT_REENVIO
+            st.toast("Auto-Save não foi enfileirado (muitos salvamentos pendentes); nova tentativa em 1 minuto.", icon="⚠️")
+    if 'snapshot_pendente' in st.session_state: acompanhar_snapshot()
 
     # --- TERMÔMETRO (AGORA HONESTO) ---
     # O progresso agora é sobre a Renda Real, não a Nominal
@@ -1024,23 +1215,19 @@ if not df.empty:
         st.info("Não foi possível montar a evolução da carteira para os parâmetros selecionados.")
 
     # OPORTUNIDADES
-    media_peso = df["% Carteira"].mean(); media_dy = df["DY (12m)"].mean()
-    df_opp = df[(df["Tipo"]=="FII") & (df["P/VP"]>=params['opp_pvp_min']) & (df["P/VP"]<=params['opp_pvp_max']) & (df["DY (12m)"]>=params['opp_dy_min']) & (df["% Carteira"]<media_peso)].copy()
-    if not df_opp.empty:
-        df_opp["AporteSugerido"] = np.maximum(0, (patr * media_peso) - df_opp["Valor Atual"])
-        df_opp = df_opp[df_opp["AporteSugerido"] >= params['opp_aporte_min']]
-        df_opp = df_opp.sort_values(by=["P/VP", "DY (12m)", "AporteSugerido"], ascending=[True, False, False]).head(4)
+    media_peso, media_dy = metricas["media_peso"], metricas["media_dy"]
+    df_opp = metricas["df_opp"]
     
     if not df_opp.empty and not st.session_state.get('privacy_mode'):
         st.subheader("🎯 Oportunidades")
-        cols = st.columns(len(df_opp))
+        cols = st.columns(len(df_opp)); txt_cards = textos_cards(df_opp)
         for idx, (_, row) in enumerate(df_opp.iterrows()):
             ativo = row["Ativo"]; preco = row["Preço Atual"]
             pvp = row["P/VP"]; dy = row["DY (12m)"]
             peso = row["% Carteira"]; valor_tem = row["Valor Atual"]
-            falta = row["AporteSugerido"]; link = row["Link"]
+            falta = row["AporteSugerido"]; link = link_ativo(ativo, row["Tipo"])
             setor = row["Setor"] # <--- NOVA VARIÁVEL
-            segmento = "Tijolo" if setor_eh_tijolo(setor) else "Papéis"
+            segmento = row["Segmento"]; txt = txt_cards.iloc[idx]
 
             with cols[idx]:
                 # AQUI ABAIXO: Adicionei uma div envolvendo Ticker e Setor
@@ -1050,15 +1237,16 @@ if not df.empty:
                             <div class="card-ticker green-t">{ativo}</div>
                             <div class="card-sector">{setor} • {segmento}</div>
                         </div>
-                        <div class="opp-price">{real_br(preco)}</div>
+                        <div class="opp-price">{txt["Preço Atual"]}</div>
                     </div>
                     <div class="card-grid">
                         <div class="card-item"><div class="card-label">P/VP</div><div class="card-val">{pvp:.2f}</div></div>
-                        <div class="card-item"><div class="card-label">DY 12M</div><div class="card-val">{pct_br(dy)}</div></div>
-                        <div class="card-item"><div class="card-label">PESO</div><div class="card-val">{pct_br(peso)}</div></div>
-                        <div class="card-item"><div class="card-label">TENHO</div><div class="card-val">{real_br(valor_tem)}</div></div>
+                        <div class="card-item"><div class="card-label">DY 12M</div><div class="card-val">{txt["DY (12m)"]}</div></div>
+                        <div class="card-item"><div class="card-label">PESO</div><div class="card-val">{txt["% Carteira"]}</div></div>
+                        <div class="card-item"><div class="card-label">TENHO</div><div class="card-val">{txt["Valor Atual"]}</div></div>
                     </div>
-                    <div class="opp-footer">Meta Média: {pct_br(media_peso)} <br>Aporte Sugerido: {real_br(falta)}</div>
+                    <div class="opp-footer">Meta Média: {pct_br(media_peso)} <br>Aporte Sugerido: {txt["AporteSugerido"]}</div>
+                    {html_veredito(ativo)}
                     <a href="{link}" target="_blank" class="link-btn">🌐 Ver Detalhes</a>
                 </div>""", unsafe_allow_html=True)
                 
@@ -1067,67 +1255,17 @@ if not df.empty:
         st.divider()
 
     # ALERTAS
-    df_alert = df[df["Tipo"]=="FII"].copy()
-    if not df_alert.empty:
-        selic_limite = selic_utilizada if selic_utilizada > 0 else selic_atual
-
-        def _classificar_risco(row):
-            motivos = []
-            if row["P/VP"] > 1.1:
-                motivos.append("Caro")
-
-            threshold_yield = media_dy * 0.85
-            if selic_limite > 0:
-                if setor_eh_tijolo(row.get("Setor", "")):
-                    threshold_yield = max(threshold_yield, selic_limite * params['radar_tijolo_pct'])
-                else:
-                    threshold_yield = max(threshold_yield, selic_limite * params['radar_outros_pct'])
-
-            if row["DY (12m)"] < threshold_yield:
-                motivos.append("Baixo Yield")
-
-            if row["P/VP"] < 0.7 and row["DY (12m)"] < 0.08:
-                motivos.append("Armadilha")
-
-            if not motivos:
-                return pd.Series({
-                    "MotivoTexto": "Observação",
-                    "RiscoOrdem": 99,
-                    "EtiquetaRisco": "Observação"
-                })
-
-            if "Baixo Yield" in motivos and "Armadilha" in motivos:
-                risco_ordem = 0
-                risco_txt = "Baixo Yield + Armadilha"
-            elif "Baixo Yield" in motivos:
-                risco_ordem = 1
-                risco_txt = "Baixo Yield"
-            elif "Caro" in motivos:
-                risco_ordem = 2
-                risco_txt = "Caro"
-            else:
-                risco_ordem = 3
-                risco_txt = " + ".join(motivos)
-
-            return pd.Series({
-                "MotivoTexto": " + ".join(motivos),
-                "RiscoOrdem": risco_ordem,
-                "EtiquetaRisco": risco_txt
-            })
-
-        df_alert[["MotivoTexto", "RiscoOrdem", "EtiquetaRisco"]] = df_alert.apply(_classificar_risco, axis=1)
-        df_alert = df_alert[df_alert["MotivoTexto"] != "Observação"]
-        df_alert = df_alert.sort_values(by=["RiscoOrdem", "Valor Atual"], ascending=[True, False]).head(4)
+    df_alert = metricas["df_alert"]
     if not df_alert.empty and not st.session_state.get('privacy_mode'):
         st.subheader("⚠️ Radar de Atenção")
-        cols = st.columns(len(df_alert))
+        cols = st.columns(len(df_alert)); txt_cards = textos_cards(df_alert)
         for idx, (_, row) in enumerate(df_alert.iterrows()):
             ativo = row["Ativo"]; preco = row["Preço Atual"]
             pm = row["Preço Médio"]; pvp = row["P/VP"]
             dy = row["DY (12m)"]; peso = row["% Carteira"]
-            valor_tem = row["Valor Atual"]; link = row["Link"]
+            valor_tem = row["Valor Atual"]; link = link_ativo(ativo, row["Tipo"])
             setor = row["Setor"] # <--- NOVA VARIÁVEL
-            segmento = "Tijolo" if setor_eh_tijolo(setor) else "Papéis"
+            segmento = row["Segmento"]; txt = txt_cards.iloc[idx]
             motivo_txt = row["MotivoTexto"]
 
             with cols[idx]:
@@ -1138,16 +1276,17 @@ if not df.empty:
                             <div class="card-ticker red-t">{ativo}</div>
                             <div class="card-sector">{setor} • {segmento}</div>
                         </div>
-                        <div class="opp-price">{real_br(preco)}</div>
+                        <div class="opp-price">{txt["Preço Atual"]}</div>
                     </div>
                     <div class="card-grid">
                         <div class="card-item"><div class="card-label">P/VP</div><div class="card-val">{pvp:.2f}</div></div>
-                        <div class="card-item"><div class="card-label">DY</div><div class="card-val">{pct_br(dy)}</div></div>
-                        <div class="card-item"><div class="card-label">MEU PM</div><div class="card-val">{real_br(pm)}</div></div>
-                        <div class="card-item"><div class="card-label">PESO</div><div class="card-val">{pct_br(peso)}</div></div>
-                        <div class="card-item" style="grid-column: span 2;"><div class="card-label">TENHO (R$)</div><div class="card-val">{real_br(valor_tem)}</div></div>
+                        <div class="card-item"><div class="card-label">DY</div><div class="card-val">{txt["DY (12m)"]}</div></div>
+                        <div class="card-item"><div class="card-label">MEU PM</div><div class="card-val">{txt["Preço Médio"]}</div></div>
+                        <div class="card-item"><div class="card-label">PESO</div><div class="card-val">{txt["% Carteira"]}</div></div>
+                        <div class="card-item" style="grid-column: span 2;"><div class="card-label">TENHO (R$)</div><div class="card-val">{txt["Valor Atual"]}</div></div>
                     </div>
                     <div class="alert-footer" style="background:white; border:1px solid #ffccbc; color:#bf360c;">🚨 {motivo_txt}</div>
+                    {html_veredito(ativo)}
                     <a href="{link}" target="_blank" class="link-btn">🌐 Ver Detalhes</a>
                 </div>""", unsafe_allow_html=True)
                 
@@ -1156,156 +1295,8 @@ if not df.empty:
         st.divider()
 
     # ABAS
-    t1, t2, t3, t4, t5 = st.tabs(["📊 Visão Setorial", "🎯 Matriz & Radar", "📋 Inventário", "📅 Agenda", "📈 Histórico"])
-
-    with t1: # GRÁFICO SETORIAL
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.sunburst(df, path=['Tipo', 'Setor', 'Ativo'], values='Valor Atual', color='Setor', title="Diversificação por Setor")
-            st.plotly_chart(fig, use_container_width=True)
-        with c2:
-            top_s = df.groupby("Setor")["Valor Atual"].sum().sort_values(ascending=False).reset_index()
-            fig2 = px.bar(top_s, x="Valor Atual", y="Setor", orientation='h', title="Exposição por Setor")
-            st.plotly_chart(fig2, use_container_width=True)
-
-    with t2: # MATRIZ + TABELA
-        st.subheader("Matriz de Valor (FIIs)")
-        df_fii = df[(df["Tipo"]=="FII") & (df["P/VP"]>0)].copy()
-        if not df_fii.empty:
-            fig = px.scatter(df_fii, x="P/VP", y="DY (12m)", size="Valor Atual", color="Ativo", text="Ativo", template="plotly_white")
-            fig.add_shape(type="rect", x0=0, y0=media_dy, x1=1.0, y1=df_fii["DY (12m)"].max()*1.1, fillcolor="rgba(0, 200, 83, 0.1)", line=dict(width=0), layer="below")
-            fig.add_vline(x=1.0, line_dash="dot", line_color="gray"); st.plotly_chart(fig, use_container_width=True)
-        st.divider(); st.subheader("🔥 Melhores Descontos")
-        df_radar = df[(df["Tipo"]=="FII") & (df["P/VP"]<1.0) & (df["P/VP"]>0.1)].copy()
-        if not df_radar.empty:
-            cols_descontos = ["Ativo", "Preço Atual", "P/VP", "DY (12m)", "Valor Atual", "% Carteira"]
-            tabela_descontos = df_radar.sort_values("P/VP")[cols_descontos]
-            st.dataframe(
-                tabela_descontos
-                .style
-                .format({"Preço Atual": real_br, "Valor Atual": real_br, "P/VP": "{:.2f}", "DY (12m)": pct_br, "% Carteira": pct_br})
-                .background_gradient(subset=["P/VP"], cmap="RdYlGn_r")
-                .background_gradient(subset=["DY (12m)"], cmap="Greens")
-                .background_gradient(subset=["% Carteira"], cmap="Blues"),
-                use_container_width=True
-            )
-
-    with t3: # INVENTÁRIO
-        cols_show = ["Link", "Ativo", "Segmento", "Setor", "Preço Médio", "Preço Atual", "Qtd", "Valor Atual", "Var %", "DY (12m)", "% Carteira", "Renda Mensal"]
-        df_inv = df[[c for c in cols_show if c in df.columns]].copy()
-        if "Link" in df_inv.columns:
-            df_inv["Ficha"] = df_inv["Link"]
-            df_inv.drop(columns=["Link"], inplace=True)
-        else:
-            df_inv["Ficha"] = None
-        ordem_cols = ["Ficha", "Ativo", "Segmento", "Setor", "Preço Médio", "Preço Atual", "Qtd", "Valor Atual", "Var %", "DY (12m)", "% Carteira", "Renda Mensal"]
-        df_inv = df_inv[[c for c in ordem_cols if c in df_inv.columns]]
-        st.dataframe(
-            df_inv.style
-            .format({"Preço Médio": real_br, "Preço Atual": real_br, "Valor Atual": real_br, "Renda Mensal": real_br, "Qtd": "{:.0f}", "Var %": pct_br, "DY (12m)": pct_br, "% Carteira": pct_br})
-            .background_gradient(subset=["Var %"], cmap="RdYlGn", vmin=-0.5, vmax=0.5)
-            .background_gradient(subset=["DY (12m)"], cmap="Greens"),
-            column_config={
-                "Ficha": st.column_config.LinkColumn(" ", display_text="🔗", help="Abrir detalhes do ativo"),
-                "% Carteira": st.column_config.ProgressColumn("Peso")
-            },
-            height=600
-        )
+    aba = st.radio("Seção", list(ABAS), horizontal=True, key="aba_ativa", label_visibility="collapsed")
+    ABAS[aba](df, metricas)
+else: st.info("Carregando...")
 
-    with t4: # AGENDA
-        st.subheader("📅 Status dos Dividendos (Data Com)")
-        df_ag = df[(df["Tipo"]=="FII") & (df["Data Com"] != "-")][["Ativo", "Data Com", "Link", "Renda Mensal"]].copy()
-        if df_ag.empty:
-            st.info("Nenhuma data encontrada.")
-        else:
-            hoje = datetime.now()
-            df_ag["Data Prevista"] = df_ag["Data Com"].apply(lambda x: resolver_data_com(x, hoje))
-            df_ag.dropna(subset=["Data Prevista"], inplace=True)
-            if df_ag.empty:
-                st.info("Não foi possível estimar as datas de corte para os registros atuais.")
-            else:
-                df_ag["Data Prevista"] = pd.to_datetime(df_ag["Data Prevista"])
-                df_ag["Dividendo Estimado"] = df_ag["Renda Mensal"].fillna(0.0)
-                df_ag["Ficha"] = df_ag["Link"]
-                df_ag["Status"] = np.where(df_ag["Data Prevista"].dt.date <= hoje.date(), "Já ocorreu", "Próxima")
-                df_ag["Mês"] = df_ag["Data Prevista"].dt.to_period("M")
-
-                meses_disponiveis = sorted(df_ag["Mês"].unique())
-                mes_atual = pd.Period(hoje, freq="M")
-                mes_default = mes_atual if mes_atual in meses_disponiveis else meses_disponiveis[0]
-                mes_escolhido = st.selectbox(
-                    "Mês de referência",
-                    options=meses_disponiveis,
-                    index=meses_disponiveis.index(mes_default) if mes_default in meses_disponiveis else 0,
-                    format_func=lambda p: f"{MESES_PT[p.month]} / {p.year}"
-                )
-
-                ref_data = datetime(mes_escolhido.year, mes_escolhido.month, 1)
-                df_ag_mes = df_ag[df_ag["Mês"] == mes_escolhido].copy().sort_values("Data Prevista")
-                if df_ag_mes.empty:
-                    st.info("Sem eventos para o mês selecionado.")
-                else:
-                    total_mes = df_ag_mes["Dividendo Estimado"].sum()
-                    if mes_escolhido == mes_atual:
-                        total_passado = df_ag_mes[df_ag_mes["Data Prevista"].dt.date <= hoje.date()]["Dividendo Estimado"].sum()
-                    else:
-                        total_passado = 0.0
-                    total_pendente = total_mes - total_passado
-
-                    c_met1, c_met2, c_met3 = st.columns(3)
-                    c_met1.metric("Previsto no mês", real_br(total_mes))
-                    c_met2.metric("Já passou", real_br(total_passado))
-                    c_met3.metric("Ainda por vir", real_br(max(total_pendente, 0.0)))
-
-                    st.markdown("### 🗓️ Calendário do mês")
-                    mapa_dividendos = df_ag_mes.groupby(df_ag_mes["Data Prevista"].dt.date)["Dividendo Estimado"].sum().to_dict()
-                    st.plotly_chart(gerar_calendario_dividendos(mapa_dividendos, ref_data), use_container_width=True)
-
-                    st.markdown("### 📌 Agenda detalhada")
-                    agenda_view = df_ag_mes[["Ativo", "Data Com", "Data Prevista", "Status", "Dividendo Estimado", "Ficha"]].copy()
-                    agenda_view["Data Prevista"] = agenda_view["Data Prevista"].dt.date
-                    st.dataframe(
-                        agenda_view,
-                        column_config={
-                            "Data Prevista": st.column_config.DateColumn("Data Com"),
-                            "Dividendo Estimado": st.column_config.NumberColumn("Dividendo Estimado", format="R$ %.2f"),
-                            "Ficha": st.column_config.LinkColumn(" ", display_text="🔗", help="Abrir detalhes do ativo")
-                        },
-                        use_container_width=True
-                    )
-
-                    st.markdown("### 📅 Totais por data")
-                    df_tot_data = df_ag_mes.groupby("Data Prevista")["Dividendo Estimado"].sum().reset_index()
-                    df_tot_data["Data Prevista"] = df_tot_data["Data Prevista"].dt.date
-                    st.dataframe(
-                        df_tot_data,
-                        column_config={
-                            "Data Prevista": st.column_config.DateColumn("Data"),
-                            "Dividendo Estimado": st.column_config.NumberColumn("Total", format="R$ %.2f")
-                        },
-                        use_container_width=True
-                    )
-
-                    st.markdown("### 💸 Totais por ativo")
-                    df_tot_ativo = df_ag_mes.groupby("Ativo")["Dividendo Estimado"].sum().reset_index().sort_values("Dividendo Estimado", ascending=False)
-                    st.dataframe(
-                        df_tot_ativo,
-                        column_config={
-                            "Dividendo Estimado": st.column_config.NumberColumn("Total", format="R$ %.2f")
-                        },
-                        use_container_width=True
-                    )
-
-    with t5: # HISTÓRICO
-        st.subheader("📈 Rentabilidade Relativa")
-        ativos = df[df["Tipo"].isin(["FII", "Ação"])]["Ativo"].tolist()
-        if ativos:
-            c_sel, c_p, c_b = st.columns([2, 1, 1])
-            with c_sel: sel = st.multiselect("Ativos:", ativos, default=ativos[:3])
-            with c_p: per = st.selectbox("Prazo:", ["1mo", "6mo", "1y", "5y"], index=1)
-            with c_b: bench = st.selectbox("Benchmark:", ["IBOV", "IFIX"], index=0)
-            if sel:
-                with st.spinner("..."):
-                    hist = obter_historico(sel, per, bench)
-                if not hist.empty: st.line_chart((hist/hist.iloc[0]-1)*100)
-else: st.info("Carregando...")
\ No newline at end of file
+painel_desempenho()
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""Benchmark da API de scraping (main.py) contra um investidor10 falso local.
+
+Exemplos:
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py --requisicoes 2000 --concorrencia 100 --latencia 0.2 --taxa-429 0.05
+    python benchmarks/bench_api.py --json resultado.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import main  # noqa: E402
+
+FIXTURE_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "fii.html")
+
+
+# --- UPSTREAM FALSO ---
+class UpstreamFalso:
+    def __init__(self, latencia=0.05, jitter=0.0, taxa_429=0.0, seed=42, universo=(), por_pagina=100):
+        with open(FIXTURE_HTML, encoding="utf-8") as f:
+            self.modelo = f.read()
+        self.universo = list(universo)
+        self.por_pagina = por_pagina
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_429 = taxa_429
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.chamadas = 0
+        self.erros_429 = 0
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.servidor.daemon_threads = True
+        self.thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def pagina_listagem(self, pagina):
+        inicio = (pagina - 1) * self.por_pagina
+        linhas = "".join(
+            f"<tr><td><a href='/fiis/{t.lower()}/'>{t}</a></td><td>R$ 98,45</td><td>0,93</td><td>11,42%</td>"
+            f"<td>R$ 0,94</td><td>R$ 4,12 M</td><td>Logística</td></tr>"
+            for t in self.universo[inicio:inicio + self.por_pagina]
+        )
+        return (
+            "<html><body><table><thead><tr><th>Ativo</th><th>Cotação</th><th>P/VP</th><th>DY (12M)</th>"
+            "<th>Último Rendimento</th><th>Liquidez Diária</th><th>Segmento</th></tr></thead>"
+            f"<tbody>{linhas}</tbody></table></body></html>"
+        )
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with upstream.lock:
+                    upstream.chamadas += 1
+                    erro = upstream.rng.random() < upstream.taxa_429
+                    if erro: upstream.erros_429 += 1
+                    atraso = upstream.latencia + upstream.rng.uniform(0, upstream.jitter)
+                time.sleep(atraso)
+                caminho, _, query = self.path.partition("?")
+                partes = [p for p in caminho.split("/") if p]
+                if erro:
+                    corpo, status = b"Too Many Requests", 429
+                elif partes == ["fiis", main.CAMINHO_LISTAGEM]:
+                    pagina = int(dict(q.split("=", 1) for q in query.split("&") if "=" in q).get("page", 1))
+                    corpo, status = upstream.pagina_listagem(pagina).encode("utf-8"), 200
+                elif len(partes) == 2 and partes[0] == "fiis":
+                    corpo, status = upstream.modelo.replace("{TICKER}", partes[1].upper()).encode("utf-8"), 200
+                else:
+                    corpo, status = b"Not Found", 404
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def zerar(self):
+        with self.lock:
+            self.chamadas = 0
+            self.erros_429 = 0
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+# --- UTILITÁRIOS ---
+def gerar_tickers(n):
+    letras = itertools.product(string.ascii_uppercase, repeat=4)
+    return ["".join(next(letras)) + "11" for _ in range(n)]
+
+def percentis(amostras):
+    if len(amostras) < 2:
+        v = amostras[0] if amostras else 0.0
+        return v, v, v
+    q = statistics.quantiles(amostras, n=100, method="inclusive")
+    return q[49], q[94], q[98]
+
+def resumo(nome, latencias, duracao, upstream_chamadas, erros):
+    p50, p95, p99 = percentis(latencias)
+    n = len(latencias)
+    return {
+        "cenario": nome,
+        "requisicoes": n,
+        "erros": erros,
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "req_por_s": round(n / duracao, 1) if duracao > 0 else 0.0,
+        "upstream_por_req": round(upstream_chamadas / n, 3) if n else 0.0,
+        "duracao_s": round(duracao, 3),
+    }
+
+
+# --- CENÁRIOS ---
+async def disparar(cliente, tickers, concorrencia):
+    sem = asyncio.Semaphore(concorrencia)
+    latencias = []
+    erros = 0
+
+    async def uma(ticker):
+        nonlocal erros
+        async with sem:
+            t0 = time.perf_counter()
+            resp = await cliente.get(f"/dados/{ticker}")
+            latencias.append(time.perf_counter() - t0)
+            if resp.status_code != 200: erros += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(uma(t) for t in tickers))
+    return latencias, time.perf_counter() - t0, erros
+
+async def cenario_requisicoes(nome, cliente, upstream, tickers, concorrencia, limpar_cache=True):
+    if limpar_cache: main.CACHE_MEMORIA.clear()
+    upstream.zerar()
+    latencias, duracao, erros = await disparar(cliente, tickers, concorrencia)
+    return resumo(nome, latencias, duracao, upstream.chamadas, erros)
+
+async def cenario_refresh(upstream, n_tickers):
+    main.CACHE_MEMORIA.clear()
+    html = upstream.modelo
+    agora = time.time()
+    for t in gerar_tickers(n_tickers):
+        main.CACHE_MEMORIA[t] = {"dados": main.extrair_dados(html.replace("{TICKER}", t)), "timestamp": agora}
+    upstream.zerar()
+    t0 = time.perf_counter()
+    await main.atualizar_cache_job()
+    duracao = time.perf_counter() - t0
+    return {
+        "cenario": "refresh_job",
+        "tickers": n_tickers,
+        "duracao_s": round(duracao, 3),
+        "tickers_por_s": round(n_tickers / duracao, 1) if duracao > 0 else 0.0,
+        "upstream_chamadas": upstream.chamadas,
+        "upstream_429": upstream.erros_429,
+    }
+
+def medir_memoria(upstream, n_tickers):
+    main.CACHE_MEMORIA.clear()
+    paginas = [(t, upstream.modelo.replace("{TICKER}", t)) for t in gerar_tickers(n_tickers)]
+    dados = [(t, main.extrair_dados(html)) for t, html in paginas]
+    tracemalloc.start()
+    antes, _ = tracemalloc.get_traced_memory()
+    agora = time.time()
+    for t, d in dados:
+        main.CACHE_MEMORIA[t] = {"dados": dict(d), "timestamp": agora}
+    depois, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cenario": "memoria_cache",
+        "tickers": n_tickers,
+        "bytes_por_ticker": round((depois - antes) / n_tickers, 1),
+    }
+
+
+# --- EXECUÇÃO ---
+async def executar(args):
+    main.PAUSA_ENTRE_FUNDOS = args.pausa_refresh
+    main.PAUSA_ENTRE_PAGINAS = args.pausa_refresh
+    main.RETRY_BACKOFF = args.backoff
+    main.MODO_BULK = not args.sem_bulk
+    main.HISTORICO_DB = os.path.join(tempfile.mkdtemp(prefix="bench-fiis-"), "historico.sqlite")
+    resultados = []
+    universo = gerar_tickers(args.tickers_listagem)
+    with UpstreamFalso(args.latencia, args.jitter, args.taxa_429, args.seed, universo, args.por_pagina) as upstream:
+        main.BASE_URL = f"{upstream.base_url}/fiis"
+        async with main.lifespan(main.app):
+            transporte = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://api", timeout=None) as cliente:
+                n = args.requisicoes
+                frios = gerar_tickers(n)
+                resultados.append(await cenario_requisicoes("frio", cliente, upstream, frios, args.concorrencia))
+
+                quentes = gerar_tickers(args.tickers_quentes)
+                rng = random.Random(args.seed)
+                amostra = [rng.choice(quentes) for _ in range(n)]
+                await cenario_requisicoes("aquecimento", cliente, upstream, quentes, args.concorrencia)
+                resultados.append(await cenario_requisicoes("quente", cliente, upstream, amostra, args.concorrencia, limpar_cache=False))
+
+                rajada = [quentes[i % 5] for i in range(n)]
+                resultados.append(await cenario_requisicoes("rajada_mesmo_ticker", cliente, upstream, rajada, args.concorrencia))
+
+                resultados.append(await cenario_refresh(upstream, args.tickers_refresh))
+        resultados.append(medir_memoria(upstream, args.tickers_memoria))
+    return resultados
+
+def imprimir(resultados):
+    for r in resultados:
+        nome = r.pop("cenario")
+        campos = "  ".join(f"{k}={v}" for k, v in r.items())
+        print(f"{nome:<22} {campos}")
+        r["cenario"] = nome
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark da API de FIIs com upstream local")
+    p.add_argument("--requisicoes", type=int, default=500)
+    p.add_argument("--concorrencia", type=int, default=50)
+    p.add_argument("--latencia", type=float, default=0.05, help="Latência base do upstream (s)")
+    p.add_argument("--jitter", type=float, default=0.02, help="Variação máxima somada à latência (s)")
+    p.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429 injetadas (0-1)")
+    p.add_argument("--backoff", type=float, default=0.05, help="Backoff de retry usado no benchmark (s)")
+    p.add_argument("--pausa-refresh", type=float, default=0.0, help="Pausa entre fundos no job de refresh (s)")
+    p.add_argument("--tickers-quentes", type=int, default=50)
+    p.add_argument("--tickers-refresh", type=int, default=100)
+    p.add_argument("--tickers-memoria", type=int, default=2000)
+    p.add_argument("--tickers-listagem", type=int, default=500, help="Fundos presentes nas páginas de listagem")
+    p.add_argument("--por-pagina", type=int, default=100, help="Fundos por página de listagem")
+    p.add_argument("--sem-bulk", action="store_true", help="Desliga o modo bulk (só páginas individuais)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--json", help="Salva os resultados neste arquivo para comparar execuções")
+    return p.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    resultados = asyncio.run(executar(args))
+    imprimir(resultados)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,140 @@
+"""Benchmark dos caminhos quentes do dashboard sobre carteiras sintéticas.
+
+Gera planilhas falsas (FIIs + manual) com 100, 1.000 e 10.000 posições, com
+valores no formato das planilhas reais ("R$ 1.234,56", "11,5%") e todas as
+variantes de Data Com, e mede as funções do motor (carteira.py) que o app.py
+e o daily_report.py usam: ingestão, datas com, setores, evolução sobre preços
+simulados, métricas/radar e agrupamentos da agenda.
+
+Exemplos:
+    python benchmarks/bench_carteira.py
+    python benchmarks/bench_carteira.py --tamanhos 100 1000 10000 50000 --repeticoes 10
+    python benchmarks/bench_carteira.py --json carteira.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import carteira  # noqa: E402
+from cache_backend import CacheMemoria  # noqa: E402
+
+SETORES = ["Logística", "Shoppings", "Lajes Corporativas", "Papel", "Recebíveis Imobiliários", "Híbrido", "Fundo de Fundos",
+           "Renda Urbana", "Agro", "Hospital", "Educacional", "Indefinido", ""]
+DATAS_COM = ["15/10", "31/10/2026", "05/11/26", "5º DIA ÚTIL", "10º DIA ÚTIL", "ÚLTIMO DIA ÚTIL", "-", "", "a definir", "30/02"]
+REFERENCIA = datetime(2026, 10, 19)
+DIAS_PRECO = 250
+
+
+# --- DADOS SINTÉTICOS ---
+def real(valor):
+    return f"R$ {valor:,.2f}".translate(str.maketrans(",.", ".,"))
+
+def planilhas(n, seed=42):
+    """Planilha de FIIs (sem cabeçalho, colunas COL_*) e manual (Ativo/Tipo/Qtd/Valor) com n posições."""
+    rng = random.Random(seed)
+    n_fiis = max(1, int(n * 0.8))
+    linhas = []
+    for i in range(n_fiis):
+        linha = [""] * (carteira.COL_SETOR + 1)
+        preco = rng.uniform(5, 200)
+        linha[carteira.COL_TICKER] = f"{''.join(chr(65 + (i // 26 ** k) % 26) for k in range(4))}11"
+        linha[carteira.COL_QTD] = str(rng.randint(0, 500))
+        linha[carteira.COL_PRECO] = real(preco)
+        linha[carteira.COL_PM] = real(preco * rng.uniform(0.8, 1.2))
+        linha[carteira.COL_VP] = real(preco * rng.uniform(0.7, 1.3))
+        linha[carteira.COL_DY] = f"{rng.uniform(4, 16):.2f}%".replace(".", ",")
+        linha[carteira.COL_DATA_COM] = rng.choice(DATAS_COM)
+        linha[carteira.COL_SETOR] = rng.choice(SETORES)
+        linhas.append(linha)
+    manual = [["Ativo", "Tipo", "Qtd", "Valor"]]
+    for i in range(n - n_fiis):
+        if i % 3:
+            manual.append([f"AC{i:04d}3", "Ação", str(rng.randint(1, 1000)), real(rng.uniform(5, 80))])
+        else:
+            manual.append([f"Renda Fixa {i}", "Tesouro", "", real(rng.uniform(1000, 50000))])
+    return carteira.tabela_planilha(linhas), carteira.tabela_planilha(manual, has_header=True)
+
+def fechamentos(tickers, seed=42):
+    """Preços de fechamento simulados (passeio aleatório) com buracos, como volta do yf.download."""
+    rng = np.random.default_rng(seed)
+    colunas = list(tickers) + ["Ibovespa", "IFIX"]
+    dados = 100 * np.exp(np.cumsum(rng.normal(0, 0.012, (DIAS_PRECO, len(colunas))), axis=0))
+    dados[rng.random(dados.shape) < 0.03] = np.nan
+    return pd.DataFrame(dados, index=pd.bdate_range(end=REFERENCIA, periods=DIAS_PRECO), columns=colunas)
+
+
+# --- MEDIÇÃO ---
+def medir(fn, repeticoes):
+    fn()  # aquecimento (imports, caches de regex/strptime)
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return {"mediana_ms": round(statistics.median(tempos), 3), "min_ms": round(min(tempos), 3)}
+
+def casos(n):
+    df_fiis, df_man = planilhas(n)
+    partes = [carteira.montar_fiis(df_fiis), carteira.montar_manual(df_man)]
+    df = carteira.consolidar(partes)
+    datas = df["Data Com"]
+    setores = df["Setor"].astype(str)
+    posicoes = df[df["Tipo"].isin(["FII", "Ação"])]
+    quantidades = posicoes.groupby("Ativo", observed=True)["Qtd"].sum()
+    precos = fechamentos(quantidades.index)
+    cdi = pd.Series(np.linspace(1.0, 1.11, DIAS_PRECO + 30), index=pd.bdate_range(end=REFERENCIA, periods=DIAS_PRECO + 30))
+    fiis = df[df["Tipo"] == "FII"]
+    agenda = carteira.montar_agenda(df, REFERENCIA)
+    mes = agenda["Mês"].mode().iloc[0] if not agenda.empty else None
+    agenda_mes = agenda[agenda["Mês"] == mes]
+    cache = CacheMemoria()
+    carteira.calcular_metricas(df, 0.045, 0.15, cache=cache)
+    return {
+        "ingestao": lambda: carteira.consolidar([carteira.montar_fiis(df_fiis), carteira.montar_manual(df_man)]),
+        "resolver_data_com (por linha)": lambda: datas.apply(lambda v: carteira.resolver_data_com(v, REFERENCIA)),
+        "resolver_datas_com (únicos)": lambda: carteira.resolver_datas_com(datas, REFERENCIA),
+        "setor_eh_tijolo (por linha)": lambda: setores.map(carteira.setor_eh_tijolo),
+        "evolucao_normalizada": lambda: carteira.evolucao_normalizada(precos, quantidades, ["Ibovespa", "IFIX"], cdi),
+        "classificar_risco": lambda: carteira.classificar_risco(fiis, fiis["DY (12m)"].mean(), 0.15, 0.6, 0.8),
+        "calcular_metricas": lambda: carteira.calcular_metricas(df, 0.045, 0.15),
+        "calcular_metricas (cache hit)": lambda: carteira.calcular_metricas(df, 0.045, 0.15, cache=cache),
+        "montar_agenda": lambda: carteira.montar_agenda(df, REFERENCIA),
+        "agrupar_agenda": lambda: carteira.agrupar_agenda(agenda_mes),
+    }
+
+def executar(args):
+    resultados = {}
+    for n in args.tamanhos:
+        resultados[n] = {nome: medir(fn, args.repeticoes) for nome, fn in casos(n).items()}
+    return resultados
+
+def imprimir(resultados):
+    tamanhos = list(resultados)
+    nomes = list(resultados[tamanhos[0]])
+    print(f"{'caso (mediana, ms)':<32}" + "".join(f"{n:>12}" for n in tamanhos))
+    for nome in nomes:
+        print(f"{nome:<32}" + "".join(f"{resultados[n][nome]['mediana_ms']:>12.2f}" for n in tamanhos))
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark do motor da carteira com carteiras sintéticas")
+    p.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000], help="Posições por carteira")
+    p.add_argument("--repeticoes", type=int, default=5, help="Medições por caso (após um aquecimento)")
+    p.add_argument("--json", help="Salva os resultados neste arquivo para comparar execuções")
+    return p.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    resultados = executar(args)
+    imprimir(resultados)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2, ensure_ascii=False)
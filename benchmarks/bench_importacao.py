@@ -0,0 +1,126 @@
+"""Partida a frio do dashboard (app.py) até a tela de login.
+
+Cada rodada é um processo Python novo com `-X importtime`: o filho executa o
+app.py via AppTest sem sessão (o script para em garantir_login) e o pai lê o
+log de imports do stderr para somar o custo por pacote.
+
+Exemplos:
+    python benchmarks/bench_importacao.py
+    python benchmarks/bench_importacao.py --rodadas 10 --top 25
+    python benchmarks/bench_importacao.py --json importacao.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app.py")
+
+# Só o necessário para o app chegar ao formulário de login
+SECRETS_FALSOS = {
+    "SHEET_URL_FIIS": "https://docs.google.com/spreadsheets/d/bench/edit",
+    "SHEET_URL_MANUAL": "https://docs.google.com/spreadsheets/d/bench/edit",
+    "GOOGLE_API_KEY": "bench",
+    "AUTH_USERS": json.dumps({"bench": "bench"}),
+}
+
+# Dependências que não deveriam carregar antes do login
+MODULOS_PESADOS = ("yfinance", "bs4", "gspread", "oauth2client", "youtubesearchpython", "plotly.express", "plotly.graph_objects")
+
+LINHA_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+# --- PROCESSO FILHO ---
+def rodar_filho(app):
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    t_streamlit = time.perf_counter()
+    ja_carregados = set(sys.modules)  # o próprio streamlit já traz parte do plotly
+
+    at = AppTest.from_file(app, default_timeout=120)
+    for chave, valor in SECRETS_FALSOS.items(): at.secrets[chave] = valor
+    at.run()
+    t_login = time.perf_counter()
+
+    print(json.dumps({
+        "import_streamlit_ms": (t_streamlit - t0) * 1000,
+        "script_ate_login_ms": (t_login - t_streamlit) * 1000,
+        "total_ms": (t_login - t0) * 1000,
+        "login_exibido": any(t.label == "Usuário" for t in at.text_input),
+        "excecoes": [str(e.value) for e in at.exception],
+        "carregados": [m for m in MODULOS_PESADOS if m in sys.modules and m not in ja_carregados],
+    }))
+
+
+# --- PROCESSO PAI ---
+def ler_importtime(stderr):
+    """Custo cumulativo (ms) dos imports de nível zero, somado por pacote raiz."""
+    por_pacote = {}
+    for linha in stderr.splitlines():
+        m = LINHA_IMPORTTIME.match(linha)
+        if not m or len(m.group(3)) > 0: continue
+        raiz = m.group(4).split(".")[0]
+        por_pacote[raiz] = por_pacote.get(raiz, 0.0) + int(m.group(2)) / 1000
+    return por_pacote
+
+def rodada(app):
+    cmd = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--filho", "--app", os.path.abspath(app)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=RAIZ, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    linhas = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not linhas:
+        raise RuntimeError(f"rodada falhou (código {proc.returncode}):\n{proc.stderr[-2000:]}")
+    resultado = json.loads(linhas[-1])
+    resultado["imports"] = ler_importtime(proc.stderr)
+    return resultado
+
+def executar(args):
+    rodadas = [rodada(args.app) for _ in range(args.rodadas)]
+    resumo = {"rodadas": len(rodadas)}
+    for campo in ("import_streamlit_ms", "script_ate_login_ms", "total_ms"):
+        valores = [r[campo] for r in rodadas]
+        resumo[campo] = {"mediana": round(statistics.median(valores), 1), "min": round(min(valores), 1)}
+    resumo["login_exibido"] = all(r["login_exibido"] for r in rodadas)
+    resumo["excecoes"] = sorted({e for r in rodadas for e in r["excecoes"]})
+    resumo["carregados_antes_do_login"] = sorted({m for r in rodadas for m in r["carregados"]})
+
+    pacotes = {p for r in rodadas for p in r["imports"]}
+    medianas = {p: statistics.median(r["imports"].get(p, 0.0) for r in rodadas) for p in pacotes}
+    resumo["imports_total_ms"] = round(sum(medianas.values()), 1)
+    resumo["imports_por_pacote_ms"] = {p: round(v, 1) for p, v in sorted(medianas.items(), key=lambda x: x[1], reverse=True)[:args.top]}
+    return resumo
+
+def imprimir(resumo):
+    print(f"rodadas={resumo['rodadas']}  login_exibido={resumo['login_exibido']}")
+    for campo in ("import_streamlit_ms", "script_ate_login_ms", "total_ms"):
+        print(f"{campo:<22} mediana={resumo[campo]['mediana']}  min={resumo[campo]['min']}")
+    print(f"{'imports_total_ms':<22} {resumo['imports_total_ms']}")
+    print(f"{'pesados_no_login':<22} {', '.join(resumo['carregados_antes_do_login']) or '-'}")
+    if resumo["excecoes"]: print(f"{'excecoes':<22} {resumo['excecoes']}")
+    print("\nimport cumulativo por pacote (mediana, ms):")
+    for pacote, ms in resumo["imports_por_pacote_ms"].items():
+        print(f"  {pacote:<28} {ms:>8.1f}")
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Tempo de partida a frio do dashboard até a tela de login")
+    p.add_argument("--rodadas", type=int, default=5, help="Processos novos medidos")
+    p.add_argument("--top", type=int, default=15, help="Pacotes listados no ranking de import")
+    p.add_argument("--app", default=APP, help="Script Streamlit medido (para comparar versões)")
+    p.add_argument("--json", help="Salva o resumo neste arquivo para comparar execuções")
+    p.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    return p.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.filho:
+        rodar_filho(args.app)
+        sys.exit(0)
+    resumo = executar(args)
+    imprimir(resumo)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": {k: v for k, v in vars(args).items() if k != "filho"}, "resumo": resumo}, f, indent=2, ensure_ascii=False)
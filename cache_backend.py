@@ -0,0 +1,362 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+
+# Backends de cache compartilháveis entre workers do uvicorn.
+# Todos se comportam como dict (ticker -> entrada serializável em JSON);
+# cada "namespace" (cache, acessos...) é um mapa independente.
+
+
+class CacheMemoria(dict):
+    """Padrão: dict por processo (um worker só)."""
+
+
+class CacheSqlite(MutableMapping):
+    """Mapa persistido em SQLite (WAL), visível por todos os processos do host."""
+
+    def __init__(self, caminho, namespace):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (namespace TEXT NOT NULL, chave TEXT NOT NULL, valor TEXT NOT NULL, "
+            "PRIMARY KEY (namespace, chave)) WITHOUT ROWID"
+        )
+
+    def _executar(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def __getitem__(self, chave):
+        linhas = self._executar("SELECT valor FROM cache WHERE namespace = ? AND chave = ?", (self.namespace, chave))
+        if not linhas: raise KeyError(chave)
+        return json.loads(linhas[0][0])
+
+    def __setitem__(self, chave, valor):
+        self._executar("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (self.namespace, chave, json.dumps(valor, ensure_ascii=False)))
+
+    def __delitem__(self, chave):
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM cache WHERE namespace = ? AND chave = ?", (self.namespace, chave))
+        if cur.rowcount == 0: raise KeyError(chave)
+
+    def __contains__(self, chave):
+        return bool(self._executar("SELECT 1 FROM cache WHERE namespace = ? AND chave = ?", (self.namespace, chave)))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return self._executar("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,))[0][0]
+
+    def keys(self):
+        return [c for (c,) in self._executar("SELECT chave FROM cache WHERE namespace = ?", (self.namespace,))]
+
+    def items(self):
+        linhas = self._executar("SELECT chave, valor FROM cache WHERE namespace = ?", (self.namespace,))
+        return [(c, json.loads(v)) for c, v in linhas]
+
+    def clear(self):
+        self._executar("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+
+class CacheRedis(MutableMapping):
+    """Mapa num hash do Redis. Aceita qualquer cliente com a API de hash do redis-py
+    (ex.: fakeredis.FakeRedis() para rodar localmente sem servidor)."""
+
+    def __init__(self, cliente, namespace, prefixo="fiis"):
+        self.cliente = cliente
+        self.chave_hash = f"{prefixo}:{namespace}"
+
+    def __getitem__(self, chave):
+        valor = self.cliente.hget(self.chave_hash, chave)
+        if valor is None: raise KeyError(chave)
+        return json.loads(valor)
+
+    def __setitem__(self, chave, valor):
+        self.cliente.hset(self.chave_hash, chave, json.dumps(valor, ensure_ascii=False))
+
+    def __delitem__(self, chave):
+        if not self.cliente.hdel(self.chave_hash, chave): raise KeyError(chave)
+
+    def __contains__(self, chave):
+        return bool(self.cliente.hexists(self.chave_hash, chave))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return self.cliente.hlen(self.chave_hash)
+
+    def keys(self):
+        return [_texto(c) for c in self.cliente.hkeys(self.chave_hash)]
+
+    def items(self):
+        return [(_texto(c), json.loads(v)) for c, v in self.cliente.hgetall(self.chave_hash).items()]
+
+    def clear(self):
+        self.cliente.delete(self.chave_hash)
+
+
+# --- CONTADORES DE ACESSO (score com meia-vida, incremento atômico) ---
+# score(t) = soma de 0.5 ** ((t - t_i) / meia_vida) sobre os acessos t_i. Cada acesso vale
+# 2 ** ((t_i - inicio da era) / meia_vida), então registrar vira uma soma pura, atômica
+# entre workers (UPSERT no SQLite, HINCRBYFLOAT no Redis). Eras de ERA_MEIAS_VIDAS
+# meias-vidas limitam o expoente; a leitura combina a era atual e a anterior (o
+# resto já decaiu para ~0). ler() devolve {"score", "ultimo"} com o score na data
+# do último acesso, o mesmo formato que o agendador já usa.
+ERA_MEIAS_VIDAS = 32
+
+
+class AcessosMemoria:
+    def __init__(self, meia_vida):
+        self.meia_vida = meia_vida
+        self.lock = threading.Lock()
+        self.pesos = {}   # (ticker, era) -> peso
+        self.ultimos = {} # ticker -> último acesso
+
+    def era(self, t):
+        return int(t // (self.meia_vida * ERA_MEIAS_VIDAS))
+
+    def peso(self, t, era):
+        return 2.0 ** ((t - era * self.meia_vida * ERA_MEIAS_VIDAS) / self.meia_vida)
+
+    def agrupar(self, acessos):
+        """[(ticker, instante)] -> {(ticker, era): [peso somado, último instante]}"""
+        lote = {}
+        for ticker, t in acessos:
+            era = self.era(t)
+            item = lote.setdefault((ticker, era), [0.0, t])
+            item[0] += self.peso(t, era); item[1] = max(item[1], t)
+        return lote
+
+    def _info(self, pesos_por_era, ultimo):
+        minima = self.era(ultimo) - 1
+        score = sum(w * 2.0 ** ((e * self.meia_vida * ERA_MEIAS_VIDAS - ultimo) / self.meia_vida)
+                    for e, w in pesos_por_era.items() if e >= minima)
+        return {"score": score, "ultimo": ultimo}
+
+    def _montar(self, linhas, ultimos):
+        # [(ticker, era, peso)] + {ticker: último} -> [(ticker, info)]
+        por_ticker = {}
+        for ticker, era, peso in linhas: por_ticker.setdefault(ticker, {})[era] = peso
+        return [(t, self._info(por_ticker.get(t, {}), u)) for t, u in ultimos.items()]
+
+    def incrementar(self, acessos):
+        with self.lock:
+            for (ticker, era), (peso, t) in self.agrupar(acessos).items():
+                self.pesos[(ticker, era)] = self.pesos.get((ticker, era), 0.0) + peso
+                self.ultimos[ticker] = max(self.ultimos.get(ticker, 0.0), t)
+
+    def items(self):
+        with self.lock:
+            ultimos = dict(self.ultimos)
+            linhas = [(t, e, w) for (t, e), w in self.pesos.items()]
+        return self._montar(linhas, ultimos)
+
+    def get(self, ticker, padrao=None):
+        with self.lock:
+            if ticker not in self.ultimos: return padrao
+            pesos = {e: w for (t, e), w in self.pesos.items() if t == ticker}
+            return self._info(pesos, self.ultimos[ticker])
+
+    def pop(self, ticker, padrao=None):
+        with self.lock:
+            for chave in [k for k in self.pesos if k[0] == ticker]: del self.pesos[chave]
+            self.ultimos.pop(ticker, None)
+        return padrao
+
+    def clear(self):
+        with self.lock:
+            self.pesos.clear(); self.ultimos.clear()
+
+
+class AcessosSqlite(AcessosMemoria):
+    def __init__(self, caminho, meia_vida):
+        super().__init__(meia_vida)
+        self.conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS acessos (ticker TEXT NOT NULL, era INTEGER NOT NULL, peso REAL NOT NULL, "
+            "ultimo REAL NOT NULL, PRIMARY KEY (ticker, era)) WITHOUT ROWID"
+        )
+
+    def incrementar(self, acessos):
+        lote = [(t, e, w, u) for (t, e), (w, u) in self.agrupar(acessos).items()]
+        if not lote: return
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO acessos VALUES (?, ?, ?, ?) ON CONFLICT (ticker, era) DO UPDATE SET "
+                    "peso = peso + excluded.peso, ultimo = max(ultimo, excluded.ultimo)", lote)
+                # Eras antigas não contam mais no score
+                self.conn.execute("DELETE FROM acessos WHERE era < ?", (min(e for _, e, _, _ in lote) - 1,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def items(self):
+        with self.lock:
+            linhas = self.conn.execute("SELECT ticker, era, peso, ultimo FROM acessos").fetchall()
+        ultimos = {}
+        for t, _, _, u in linhas: ultimos[t] = max(ultimos.get(t, 0.0), u)
+        return self._montar([(t, e, w) for t, e, w, _ in linhas], ultimos)
+
+    def get(self, ticker, padrao=None):
+        with self.lock:
+            linhas = self.conn.execute("SELECT era, peso, ultimo FROM acessos WHERE ticker = ?", (ticker,)).fetchall()
+        if not linhas: return padrao
+        return self._info({e: w for e, w, _ in linhas}, max(u for _, _, u in linhas))
+
+    def pop(self, ticker, padrao=None):
+        with self.lock:
+            self.conn.execute("DELETE FROM acessos WHERE ticker = ?", (ticker,))
+        return padrao
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM acessos")
+
+
+class AcessosRedis(AcessosMemoria):
+    """Um hash por era (ticker -> peso, via HINCRBYFLOAT) e um hash com o último acesso."""
+
+    def __init__(self, cliente, meia_vida, prefixo="fiis:acessos"):
+        super().__init__(meia_vida)
+        self.cliente = cliente
+        self.prefixo = prefixo
+        self.chave_ultimos = f"{prefixo}:ultimo"
+
+    def _chave_era(self, era):
+        return f"{self.prefixo}:{era}"
+
+    def incrementar(self, acessos):
+        lote = self.agrupar(acessos)
+        if not lote: return
+        pipe = self.cliente.pipeline(transaction=False)
+        for (ticker, era), (peso, t) in lote.items():
+            pipe.hincrbyfloat(self._chave_era(era), ticker, peso)
+            pipe.expire(self._chave_era(era), int(self.meia_vida * ERA_MEIAS_VIDAS * 3))
+            pipe.hset(self.chave_ultimos, ticker, t)  # último escritor vence: instantes quase iguais
+        pipe.execute()
+
+    def _eras(self, ultimo):
+        atual = self.era(ultimo)
+        return [atual - 1, atual]
+
+    def items(self):
+        ultimos = {_texto(t): float(u) for t, u in self.cliente.hgetall(self.chave_ultimos).items()}
+        if not ultimos: return []
+        eras = self._eras(max(ultimos.values()))
+        linhas = [(_texto(t), e, float(w)) for e in eras for t, w in self.cliente.hgetall(self._chave_era(e)).items()]
+        return self._montar(linhas, ultimos)
+
+    def get(self, ticker, padrao=None):
+        ultimo = self.cliente.hget(self.chave_ultimos, ticker)
+        if ultimo is None: return padrao
+        ultimo = float(ultimo)
+        eras = self._eras(ultimo)
+        valores = [self.cliente.hget(self._chave_era(e), ticker) for e in eras]
+        return self._info({e: float(w) for e, w in zip(eras, valores) if w is not None}, ultimo)
+
+    def pop(self, ticker, padrao=None):
+        ultimo = self.cliente.hget(self.chave_ultimos, ticker)
+        if ultimo is None: return padrao
+        pipe = self.cliente.pipeline(transaction=False)
+        for e in self._eras(float(ultimo)): pipe.hdel(self._chave_era(e), ticker)
+        pipe.hdel(self.chave_ultimos, ticker)
+        pipe.execute()
+        return padrao
+
+    def clear(self):
+        chaves = [self.chave_ultimos] + [_texto(c) for c in self.cliente.keys(f"{self.prefixo}:*")]
+        self.cliente.delete(*set(chaves))
+
+
+# --- ELEIÇÃO DE LÍDER (só um processo roda o agendador) ---
+class LiderancaLocal:
+    def __init__(self):
+        self.dono = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def tentar(self, ttl):
+        return True
+
+    def liberar(self):
+        pass
+
+
+class LiderancaSqlite(LiderancaLocal):
+    """Lease renovável numa linha do SQLite; expira se o líder morrer."""
+
+    def __init__(self, caminho, nome="agendador"):
+        super().__init__()
+        self.nome = nome
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS lideranca (nome TEXT PRIMARY KEY, dono TEXT NOT NULL, expira REAL NOT NULL)")
+
+    def tentar(self, ttl):
+        agora = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self.conn.execute("SELECT dono, expira FROM lideranca WHERE nome = ?", (self.nome,)).fetchone()
+                if linha is None or linha[0] == self.dono or linha[1] < agora:
+                    self.conn.execute("INSERT OR REPLACE INTO lideranca VALUES (?, ?, ?)", (self.nome, self.dono, agora + ttl))
+                    self.conn.execute("COMMIT")
+                    return True
+                self.conn.execute("COMMIT")
+                return False
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def liberar(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM lideranca WHERE nome = ? AND dono = ?", (self.nome, self.dono))
+
+
+class LiderancaRedis(LiderancaLocal):
+    def __init__(self, cliente, nome="fiis:lider"):
+        super().__init__()
+        self.cliente = cliente
+        self.nome = nome
+
+    def tentar(self, ttl):
+        ttl_ms = int(ttl * 1000)
+        if self.cliente.set(self.nome, self.dono, nx=True, px=ttl_ms): return True
+        if _texto(self.cliente.get(self.nome)) == self.dono:
+            self.cliente.pexpire(self.nome, ttl_ms)
+            return True
+        return False
+
+    def liberar(self):
+        if _texto(self.cliente.get(self.nome)) == self.dono:
+            self.cliente.delete(self.nome)
+
+
+# --- FÁBRICA ---
+def criar_backend(tipo="memoria", caminho_sqlite="cache.sqlite", redis_url=None, cliente_redis=None, meia_vida=24 * 3600):
+    """Retorna (fabrica_de_mapas(namespace), lideranca, acessos) para o tipo configurado."""
+    tipo = (tipo or "memoria").lower()
+    if tipo == "sqlite":
+        return (lambda ns: CacheSqlite(caminho_sqlite, ns)), LiderancaSqlite(caminho_sqlite), AcessosSqlite(caminho_sqlite, meia_vida)
+    if tipo == "redis":
+        if cliente_redis is None:
+            import redis
+            cliente_redis = redis.Redis.from_url(redis_url or "redis://localhost:6379/0")
+        return (lambda ns: CacheRedis(cliente_redis, ns)), LiderancaRedis(cliente_redis), AcessosRedis(cliente_redis, meia_vida)
+    return (lambda ns: CacheMemoria()), LiderancaLocal(), AcessosMemoria(meia_vida)
+
+
+def _texto(valor):
+    return valor.decode("utf-8") if isinstance(valor, bytes) else valor
@@ -0,0 +1,75 @@
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+
+import pandas as pd
+from pandas.tseries.holiday import AbstractHolidayCalendar, Easter, GoodFriday, Holiday
+from pandas.tseries.offsets import CustomBusinessDay, Day
+
+try:
+    from zoneinfo import ZoneInfo
+    TZ_B3 = ZoneInfo("America/Sao_Paulo")
+except Exception:
+    # Sem base tz no sistema: Brasília não tem horário de verão desde 2019
+    TZ_B3 = timezone(timedelta(hours=-3))
+
+# Pregão regular e janela de consolidação pós-fechamento (horário de Brasília)
+ABERTURA = dtime(10, 0)
+FECHAMENTO = dtime(18, 0)
+CONSOLIDACAO = dtime(18, 30)
+
+
+class CalendarioB3(AbstractHolidayCalendar):
+    rules = [
+        Holiday("Confraternização Universal", month=1, day=1),
+        Holiday("Carnaval (segunda)", month=1, day=1, offset=[Easter(), Day(-48)]),
+        Holiday("Carnaval (terça)", month=1, day=1, offset=[Easter(), Day(-47)]),
+        GoodFriday,
+        Holiday("Tiradentes", month=4, day=21),
+        Holiday("Dia do Trabalho", month=5, day=1),
+        Holiday("Corpus Christi", month=1, day=1, offset=[Easter(), Day(60)]),
+        Holiday("Independência", month=9, day=7),
+        Holiday("Nossa Senhora Aparecida", month=10, day=12),
+        Holiday("Finados", month=11, day=2),
+        Holiday("Proclamação da República", month=11, day=15),
+        Holiday("Consciência Negra", month=11, day=20, start_date=date(2024, 1, 1)),
+        Holiday("Véspera de Natal", month=12, day=24),
+        Holiday("Natal", month=12, day=25),
+        Holiday("Último dia do ano", month=12, day=31),
+    ]
+
+
+# Mesmo uso do BDay do pandas, mas pulando também os feriados da B3
+DIA_UTIL_B3 = CustomBusinessDay(calendar=CalendarioB3())
+
+
+@lru_cache(maxsize=16)
+def feriados_ano(ano):
+    return frozenset(d.date() for d in CalendarioB3().holidays(start=f"{ano}-01-01", end=f"{ano}-12-31"))
+
+
+def eh_dia_util(dia):
+    if isinstance(dia, datetime): dia = dia.date()
+    return dia.weekday() < 5 and dia not in feriados_ano(dia.year)
+
+
+def agora_b3(ts=None):
+    return datetime.fromtimestamp(ts, TZ_B3) if ts is not None else datetime.now(TZ_B3)
+
+
+def fase_mercado(momento):
+    """'pregao', 'pos' (após a consolidação) ou 'fechado'."""
+    if not eh_dia_util(momento): return "fechado"
+    hora = momento.time()
+    if ABERTURA <= hora < FECHAMENTO: return "pregao"
+    if hora >= CONSOLIDACAO: return "pos"
+    return "fechado"
+
+
+def enesimo_dia_util(ano, mes, n):
+    inicio = DIA_UTIL_B3.rollforward(pd.Timestamp(ano, mes, 1))
+    return (inicio + DIA_UTIL_B3 * (n - 1)).to_pydatetime()
+
+
+def ultimo_dia_util(ano, mes):
+    fim = pd.Timestamp(ano, mes, 1) + pd.offsets.MonthEnd(0)
+    return DIA_UTIL_B3.rollback(fim).to_pydatetime()
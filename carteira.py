@@ -0,0 +1,409 @@
+import hashlib
+import re
+import unicodedata
+from datetime import datetime
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calendario_b3 import enesimo_dia_util, ultimo_dia_util
+
+# Núcleo da carteira sem Streamlit: recebe as planilhas já lidas (DataFrames) e
+# devolve o DataFrame tipado e as métricas usados pelo dashboard (app.py), pelo
+# relatório (daily_report.py) e pelos benchmarks. Quem chama decide de onde vêm
+# planilhas, indicadores, preços e onde (se) as métricas ficam em cache.
+
+# Mapeamento de Colunas (Excel -> Python Index)
+COL_TICKER = 0
+COL_QTD = 5
+COL_PRECO = 8
+COL_PM = 9
+COL_VP = 11
+COL_DY = 17
+COL_DATA_COM = 20
+COL_SETOR = 24
+
+# Tipos fixos das colunas: categorias para os textos repetidos, float64 para números
+TIPOS_ATIVO = ["FII", "Ação", "Outros"]
+COLS_BASE = ["Ativo", "Tipo", "Setor", "Qtd", "Preço Médio", "Preço Atual", "VP", "DY (12m)", "Data Com"]
+COLS_NUMERICAS = ["Qtd", "Preço Médio", "Preço Atual", "VP", "DY (12m)"]
+
+TIJOLO_KEYWORDS = [
+    "TIJOLO", "LOGIST", "SHOP", "LAJE", "CORPORAT", "RESID", "HOSPITAL", "HOTEL", "EDUC", "AGRO", "IMOBILIARIO URB",
+    "RENDA URB", "DESENV", "MULTIPROPRI", "HÍBRID", "HIBRID", "INDUSTR"
+]
+
+
+# --- PLANILHAS ---
+def extrair_sheet_info(url: str) -> Tuple[Optional[str], Optional[int]]:
+    if not url:
+        return None, None
+    sheet_id = None
+    if "/d/" in url:
+        try:
+            parte = url.split("/d/")[1]
+            if parte.startswith("e/"):
+                parte = parte.split("/", 2)[1] if "/" in parte[2:] else parte[2:]
+            sheet_id = parte.split("/")[0]
+        except Exception:
+            sheet_id = None
+    if sheet_id is None:
+        sheet_id = url
+    gid = None
+    match = re.search(r"gid=(\d+)", url)
+    if match:
+        try:
+            gid = int(match.group(1))
+        except Exception:
+            gid = None
+    return sheet_id, gid
+
+def tabela_planilha(valores, has_header=False):
+    # get_all_values() -> DataFrame (colunas por índice ou pela primeira linha)
+    df = pd.DataFrame(valores)
+    if has_header and not df.empty:
+        df.columns = df.iloc[0]
+        df = df.drop(df.index[0])
+    return df.reset_index(drop=True)
+
+def to_f(serie):
+    # Coluna da planilha ("R$ 1.234,56", "12,5%") -> float64; vazio/inválido vira 0.0
+    texto = serie.astype(str).str.replace(r"R\$|%| |\.", "", regex=True).str.replace(",", ".", regex=False)
+    return pd.to_numeric(texto.where(serie.notna()), errors="coerce").fillna(0.0).astype("float64")
+
+def _coluna_planilha(df_planilha, indice):
+    if indice in df_planilha.columns: return df_planilha[indice]
+    return pd.Series(np.nan, index=df_planilha.index, dtype=object)
+
+
+# --- SETORES / LINKS ---
+def normalizar_setor(setor):
+    if not setor:
+        return ""
+    texto = unicodedata.normalize('NFD', str(setor))
+    texto = ''.join(ch for ch in texto if unicodedata.category(ch) != 'Mn')
+    return texto.upper().strip()
+
+def setor_eh_tijolo(setor):
+    norm = normalizar_setor(setor)
+    if not norm:
+        return False
+    return any(chave in norm for chave in TIJOLO_KEYWORDS)
+
+def link_ativo(ativo, tipo):
+    if tipo == "FII": return f"https://investidor10.com.br/fiis/{ativo.lower()}/"
+    if tipo == "Ação": return f"https://investidor10.com.br/acoes/{ativo.lower()}/"
+    return None
+
+def links_ativos(df_base):
+    # O link não fica guardado no DataFrame: é derivado do Ativo só onde é exibido
+    return pd.Series([link_ativo(a, t) for a, t in zip(df_base["Ativo"], df_base["Tipo"])], index=df_base.index, dtype=object)
+
+
+# --- INGESTÃO ---
+def montar_fiis(df_fiis):
+    """Planilha de FIIs (sem cabeçalho, colunas COL_*) -> linhas base dos FIIs com posição."""
+    if df_fiis is None or df_fiis.empty: return pd.DataFrame(columns=COLS_BASE)
+    ativo = df_fiis[COL_TICKER].astype(str).str.strip().str.upper()
+    qtd = to_f(_coluna_planilha(df_fiis, COL_QTD))
+    dy = to_f(_coluna_planilha(df_fiis, COL_DY))
+    setor = _coluna_planilha(df_fiis, COL_SETOR).astype(str).str.strip()
+    data_com = _coluna_planilha(df_fiis, COL_DATA_COM)
+    fiis = pd.DataFrame({
+        "Ativo": ativo, "Tipo": "FII",
+        "Setor": setor.mask((setor == "") | (setor.str.lower().isin(["nan", "none"])), "Indefinido"),
+        "Qtd": qtd, "Preço Médio": to_f(_coluna_planilha(df_fiis, COL_PM)), "Preço Atual": to_f(_coluna_planilha(df_fiis, COL_PRECO)),
+        "VP": to_f(_coluna_planilha(df_fiis, COL_VP)), "DY (12m)": np.where(dy > 2.0, dy / 100, dy),
+        "Data Com": data_com.astype(str).str.strip().where(data_com.notna(), "-"),
+    })
+    return fiis[ativo.str.match(r'^[A-Z]{4}11[B]?$') & (qtd > 0)]
+
+def aplicar_indicadores(fiis, indicadores):
+    """Indicadores da API ({ticker: {preco, vp, dy, setor, data_com}}) têm prioridade sobre as fórmulas da planilha."""
+    if not indicadores or fiis.empty: return fiis
+    fiis = fiis.copy()
+    api = pd.DataFrame([indicadores.get(t) or {} for t in fiis["Ativo"]], index=fiis.index)
+    for campo, coluna, escala in (("preco", "Preço Atual", 1), ("vp", "VP", 1), ("dy", "DY (12m)", 100)):
+        if campo not in api: continue
+        valor = pd.to_numeric(api[campo], errors="coerce")
+        fiis[coluna] = fiis[coluna].mask(valor.notna() & (valor != 0), valor / escala)
+    if "setor" in api:
+        fiis["Setor"] = fiis["Setor"].mask((fiis["Setor"] == "Indefinido") & api["setor"].notna() & (api["setor"] != ""), api["setor"])
+    if "data_com" in api:
+        fiis["Data Com"] = fiis["Data Com"].mask(fiis["Data Com"].isin(["", "-", "nan"]) & api["data_com"].notna() & (api["data_com"] != ""), api["data_com"])
+    return fiis
+
+def montar_manual(df_man, preco_acao=None):
+    """Planilha manual (Ativo, Tipo, Qtd, Valor) -> linhas base de ações e outros ativos.
+    `preco_acao(ticker)` opcional: cotação ao vivo das ações (0 mantém o valor da planilha)."""
+    if df_man is None or len(df_man.columns) < 4: return pd.DataFrame(columns=COLS_BASE)
+    df_man = df_man.iloc[:, :4]
+    df_man.columns = ["Ativo", "Tipo", "Qtd", "Valor"]
+    ativo = df_man["Ativo"].astype(str).str.strip().str.upper()
+    df_man = df_man[~ativo.isin(["ATIVO", "TOTAL", "", "NAN"])]; ativo = ativo[df_man.index]
+    eh_acao = df_man["Tipo"].astype(str).str.strip().str.upper().str.contains("AÇÃO|ACAO").to_numpy()
+    valor = to_f(df_man["Valor"])
+    preco = valor.copy()
+    if preco_acao is not None:
+        for i in np.flatnonzero(eh_acao):
+            plive = preco_acao(ativo.iloc[i])
+            if plive > 0: preco.iloc[i] = plive
+    return pd.DataFrame({
+        "Ativo": ativo, "Tipo": np.where(eh_acao, "Ação", "Outros"), "Setor": np.where(eh_acao, "Ações", "Ação/Outros"),
+        "Qtd": np.where(eh_acao, to_f(df_man["Qtd"]), 1.0), "Preço Médio": np.where(eh_acao, valor, 0.0), "Preço Atual": preco,
+        "VP": 0.0, "DY (12m)": 0.0, "Data Com": "-",
+    })
+
+def tickers_cotados(partes):
+    # FIIs e ações (os que têm cotação em bolsa), sem repetição
+    ativos = [p.loc[p["Tipo"].isin(["FII", "Ação"]), "Ativo"] for p in partes if p is not None and not p.empty]
+    return list(dict.fromkeys(pd.concat(ativos))) if ativos else []
+
+def consolidar(partes, precos=None):
+    """Junta as linhas base e calcula Valor Atual, Renda, P/VP, Var % e % Carteira.
+    `precos` opcional ({ticker: cotação}) substitui o Preço Atual de FIIs e ações."""
+    partes = [p for p in partes if p is not None and not p.empty]
+    if not partes: return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True).drop_duplicates(subset=["Ativo", "Tipo"], keep="first").reset_index(drop=True)
+    df[COLS_NUMERICAS] = df[COLS_NUMERICAS].astype("float64").replace([np.inf, -np.inf], 0.0).fillna(0.0)
+
+    tipo = df["Tipo"].to_numpy()
+    eh_posicao = np.isin(tipo, ["FII", "Ação"])
+    if precos:
+        cotacao = df["Ativo"].map(precos).to_numpy(dtype=float)
+        df["Preço Atual"] = np.where(eh_posicao & (cotacao > 0), cotacao, df["Preço Atual"].to_numpy())
+
+    qtd, pm, pa, vp, dy = (df[c].to_numpy() for c in COLS_NUMERICAS)
+    valor_atual = np.where(eh_posicao, qtd * pa, pa)
+    investido = np.where(eh_posicao & (pm > 0), qtd * pm, valor_atual)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["Valor Atual"] = valor_atual
+        df["Total Investido"] = investido
+        df["Lucro R$"] = valor_atual - investido
+        df["Renda Mensal"] = np.where(tipo == "FII", valor_atual * dy / 12, 0.0)
+        df["P/VP"] = np.where(vp > 0, pa / vp, 0.0)
+        df["Var %"] = np.where(investido > 0, valor_atual / investido - 1, 0.0)
+    calculadas = ["Valor Atual", "Total Investido", "Lucro R$", "Renda Mensal", "P/VP", "Var %"]
+    df[calculadas] = df[calculadas].replace([np.inf, -np.inf], 0.0).fillna(0.0)
+    total = df["Valor Atual"].sum()
+    df["% Carteira"] = df["Valor Atual"] / total if total > 0 else 0.0
+
+    # Classificação por setor único (poucos setores distintos, muitas linhas)
+    df["Tipo"] = pd.Categorical(df["Tipo"], categories=TIPOS_ATIVO)
+    df["Setor"] = df["Setor"].astype("category")
+    segmentos = {s: "Tijolo" if setor_eh_tijolo(s) else "Papéis" for s in df["Setor"].cat.categories}
+    df["Segmento"] = df["Setor"].map(segmentos).astype(pd.CategoricalDtype(["Tijolo", "Papéis"]))
+    return df
+
+
+# --- MÉTRICAS ---
+# Parâmetros das recomendações (o app deixa o usuário ajustar; selic_custom 0 = SELIC oficial)
+PARAMS_PADRAO = {
+    "selic_custom": 0.0,
+    "opp_pvp_min": 0.80,
+    "opp_pvp_max": 0.99,
+    "opp_dy_min": 0.12,
+    "opp_aporte_min": 1000.0,
+    "radar_tijolo_pct": 0.60,
+    "radar_outros_pct": 0.80,
+}
+
+def yield_real(renda_mensal, patrimonio, ipca):
+    # Fisher: ((1 + Yield_Nominal) / (1 + Inflação)) - 1
+    yield_nominal_anual = (renda_mensal * 12) / patrimonio if patrimonio > 0 else 0
+    return ((1 + yield_nominal_anual) / (1 + ipca)) - 1
+
+def filtrar_oportunidades(df_base, patr, media_peso, params):
+    """FIIs descontados (faixa de P/VP), com DY mínimo e abaixo do peso médio -> top 4 com aporte sugerido."""
+    df_opp = df_base[(df_base["Tipo"]=="FII") & (df_base["P/VP"]>=params['opp_pvp_min']) & (df_base["P/VP"]<=params['opp_pvp_max']) & (df_base["DY (12m)"]>=params['opp_dy_min']) & (df_base["% Carteira"]<media_peso)].copy()
+    if not df_opp.empty:
+        df_opp["AporteSugerido"] = np.maximum(0, (patr * media_peso) - df_opp["Valor Atual"])
+        df_opp = df_opp[df_opp["AporteSugerido"] >= params['opp_aporte_min']]
+        df_opp = df_opp.sort_values(by=["P/VP", "DY (12m)", "AporteSugerido"], ascending=[True, False, False]).head(4)
+    return df_opp
+
+def classificar_risco(df_fii, media_dy, selic_limite, tijolo_pct, outros_pct):
+    pvp = df_fii["P/VP"].to_numpy(); dy = df_fii["DY (12m)"].to_numpy()
+    caro = pvp > 1.1
+    threshold_yield = np.full(len(df_fii), media_dy * 0.85)
+    if selic_limite > 0:
+        piso = np.where(df_fii["Segmento"].to_numpy() == "Tijolo", selic_limite * tijolo_pct, selic_limite * outros_pct)
+        threshold_yield = np.maximum(threshold_yield, piso)
+    baixo = dy < threshold_yield
+    armadilha = (pvp < 0.7) & (dy < 0.08)
+
+    motivos = [" + ".join(m for m, ativo in zip(("Caro", "Baixo Yield", "Armadilha"), flags) if ativo) for flags in zip(caro, baixo, armadilha)]
+    ordem = np.select([baixo & armadilha, baixo, caro, armadilha], [0, 1, 2, 3], default=99)
+    etiqueta = np.select([baixo & armadilha, baixo, caro], ["Baixo Yield + Armadilha", "Baixo Yield", "Caro"], default=np.array(motivos, dtype=object))
+
+    out = df_fii.copy()
+    out["MotivoTexto"] = [m or "Observação" for m in motivos]
+    out["RiscoOrdem"] = ordem
+    out["EtiquetaRisco"] = np.where(ordem == 99, "Observação", etiqueta)
+    return out
+
+def radar_atencao(df_base, media_dy, selic_limite, params):
+    """FIIs caros, com yield abaixo do piso ou em possível armadilha -> top 4 por gravidade e tamanho."""
+    df_alert = df_base[df_base["Tipo"]=="FII"]
+    if df_alert.empty: return df_alert
+    df_alert = classificar_risco(df_alert, media_dy, selic_limite, params['radar_tijolo_pct'], params['radar_outros_pct'])
+    df_alert = df_alert[df_alert["MotivoTexto"] != "Observação"]
+    return df_alert.sort_values(by=["RiscoOrdem", "Valor Atual"], ascending=[True, False]).head(4)
+
+def chave_metricas(df_base, ipca_atual, selic_atual, params):
+    # Impressão digital do DataFrame inteiro (as métricas devolvem fatias com todas as colunas),
+    # na ordem das linhas e colunas, + parâmetros (chave dos backends de cache)
+    digest = hashlib.sha1(repr(list(df_base.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df_base, index=True).to_numpy().tobytes())
+    return f"{digest.hexdigest()}|{ipca_atual!r}|{selic_atual!r}|{sorted(params.items())!r}"
+
+def calcular_metricas(df_base, ipca_atual, selic_atual, params=None, cache=None):
+    """KPIs, agregados, oportunidades e radar da carteira consolidada.
+    `cache` opcional: qualquer mapa mutável (dict, cache_backend.CacheMemoria...) que guarde objetos Python."""
+    params = {**PARAMS_PADRAO, **(params or {})}
+    if cache is not None:
+        chave = chave_metricas(df_base, ipca_atual, selic_atual, params)
+        if chave in cache: return cache[chave]
+    m = {}
+    patr = m["patr"] = df_base["Valor Atual"].sum()
+    renda_nominal = m["renda_nominal"] = df_base["Renda Mensal"].sum()
+    investido = m["investido"] = df_base["Total Investido"].sum()
+    selic_utilizada = m["selic_utilizada"] = params['selic_custom'] if params.get('selic_custom', 0) > 0 else selic_atual
+
+    # --- CÁLCULO DA REALIDADE (Ajuste de Inflação) ---
+    # 1. Converter IPCA anual para mensal (Juros Compostos)
+    ipca_mensal = ((1 + ipca_atual) ** (1/12)) - 1
+    # 2. Quanto do dividendo deve ser REINVESTIDO obrigatoriamente para manter o poder de compra do principal
+    m["custo_manutencao_patrimonio"] = patr * ipca_mensal
+    # 3. Renda Real (O que sobra para gastar sem corroer o patrimônio)
+    m["renda_real_disponivel"] = renda_nominal - m["custo_manutencao_patrimonio"]
+    # 4. Yield Real Anualizado
+    m["yield_real_perc"] = yield_real(renda_nominal, patr, ipca_atual)
+
+    # --- MÉTRICAS DE CARTEIRA ---
+    m["val_rs"] = patr - investido
+    m["val_pct"] = m["val_rs"] / investido if investido > 0 else 0
+    por_tipo = df_base.groupby("Tipo", observed=True)["Valor Atual"].sum()
+    m["fiis_total"] = por_tipo.get("FII", 0.0)
+    m["acoes_total"] = por_tipo.get("Ação", 0.0)
+    m["renda_variavel_total"] = m["fiis_total"] + m["acoes_total"]
+    m["outros_total"] = max(patr - m["renda_variavel_total"], 0.0)
+
+    # --- AGREGADOS POR SETOR / SEGMENTO ---
+    m["setores"] = df_base.groupby("Setor", observed=True)["Valor Atual"].sum().sort_values(ascending=False).reset_index()
+    m["segmentos"] = df_base[df_base["Tipo"] == "FII"].groupby("Segmento", observed=True)["Valor Atual"].sum()
+
+    # --- OPORTUNIDADES / RADAR DE ATENÇÃO ---
+    media_peso = m["media_peso"] = df_base["% Carteira"].mean()
+    media_dy = m["media_dy"] = df_base["DY (12m)"].mean()
+    m["df_opp"] = filtrar_oportunidades(df_base, patr, media_peso, params)
+    m["df_alert"] = radar_atencao(df_base, media_dy, selic_utilizada if selic_utilizada > 0 else selic_atual, params)
+
+    # --- MATRIZ / DESCONTOS ---
+    m["df_fii"] = df_base[(df_base["Tipo"]=="FII") & (df_base["P/VP"]>0)]
+    m["df_radar"] = df_base[(df_base["Tipo"]=="FII") & (df_base["P/VP"]<1.0) & (df_base["P/VP"]>0.1)].sort_values("P/VP")
+    if cache is not None: cache[chave] = m
+    return m
+
+
+# --- AGENDA (DATA COM) ---
+def resolver_data_com(valor, referencia=None):
+    if referencia is None:
+        referencia = datetime.now()
+    if pd.isna(valor):
+        return None
+    texto = str(valor).strip()
+    if not texto or texto == "-":
+        return None
+    texto_upper = texto.upper()
+
+    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
+        try:
+            return datetime.strptime(texto, fmt)
+        except ValueError:
+            continue
+
+    if re.match(r"^\d{1,2}/\d{1,2}$", texto):
+        try:
+            dia, mes = map(int, texto.split("/"))
+            ano = referencia.year
+            dt = datetime(ano, mes, dia)
+            if dt.date() < referencia.date():
+                dt = datetime(ano + 1, mes, dia)
+            return dt
+        except ValueError:
+            return None
+
+    ano_ref, mes_ref = referencia.year, referencia.month
+
+    # Dias úteis pelo calendário da B3 (fins de semana e feriados)
+    match = re.match(r"(\d{1,2})º DIA ÚTIL", texto_upper)
+    if match:
+        try:
+            pos = int(match.group(1))
+            if pos <= 0:
+                return None
+            return enesimo_dia_util(ano_ref, mes_ref, pos)
+        except Exception:
+            return None
+
+    if "ÚLTIMO DIA ÚTIL" in texto_upper:
+        return ultimo_dia_util(ano_ref, mes_ref)
+
+    return None
+
+def resolver_datas_com(serie, referencia=None):
+    # Poucos textos distintos ("15/10", "5º DIA ÚTIL"...) para muitas linhas: resolve cada um uma vez
+    referencia = referencia or datetime.now()
+    unicos = {v: resolver_data_com(v, referencia) for v in pd.unique(serie)}
+    return pd.to_datetime(serie.map(unicos))
+
+def montar_agenda(df_base, hoje=None):
+    """FIIs com Data Com -> Data Prevista, Dividendo Estimado, Status (já ocorreu/próxima) e Mês."""
+    hoje = hoje or datetime.now()
+    df_ag = df_base[(df_base["Tipo"]=="FII") & (df_base["Data Com"] != "-")][["Ativo", "Tipo", "Data Com", "Renda Mensal"]].copy()
+    if df_ag.empty: return df_ag
+    df_ag["Data Prevista"] = resolver_datas_com(df_ag["Data Com"], hoje)
+    df_ag = df_ag.dropna(subset=["Data Prevista"])
+    df_ag["Dividendo Estimado"] = df_ag["Renda Mensal"].fillna(0.0)
+    df_ag["Status"] = np.where(df_ag["Data Prevista"].dt.date <= hoje.date(), "Já ocorreu", "Próxima")
+    df_ag["Mês"] = df_ag["Data Prevista"].dt.to_period("M")
+    return df_ag
+
+def agrupar_agenda(df_ag_mes):
+    """Eventos de um mês -> (mapa dia -> total, totais por data, totais por ativo)."""
+    dividendos = df_ag_mes["Dividendo Estimado"]
+    mapa_dividendos = dividendos.groupby(df_ag_mes["Data Prevista"].dt.date).sum().to_dict()
+    por_data = dividendos.groupby(df_ag_mes["Data Prevista"]).sum().reset_index()
+    por_ativo = dividendos.groupby(df_ag_mes["Ativo"]).sum().reset_index().sort_values("Dividendo Estimado", ascending=False)
+    return mapa_dividendos, por_data, por_ativo
+
+
+# --- EVOLUÇÃO ---
+def evolucao_normalizada(fechamentos, quantidades, benchmarks=(), cdi_acumulado=None):
+    """Fechamentos (colunas = tickers/benchmarks) e quantidades -> variação % acumulada
+    da carteira e de cada referência a partir do primeiro dia com dado."""
+    dados = fechamentos.replace([np.inf, -np.inf], np.nan).sort_index()
+    presentes = [t for t in quantidades.index if t in dados.columns]
+    if not presentes: return pd.DataFrame()
+    precos = dados[presentes].ffill().bfill()
+    carteira_series = (precos * quantidades[presentes]).sum(axis=1, min_count=1).replace([np.inf, -np.inf], np.nan).dropna()
+    if carteira_series.empty: return pd.DataFrame()
+
+    plot_df = pd.DataFrame({"Carteira": carteira_series})
+    for nome in benchmarks:
+        if nome in dados.columns:
+            serie_bench = dados[nome].reindex(plot_df.index).ffill().dropna()
+            if not serie_bench.empty: plot_df[nome] = serie_bench
+    if cdi_acumulado is not None and not cdi_acumulado.empty:
+        cdi_series = cdi_acumulado.reindex(plot_df.index, method="ffill").dropna()
+        if not cdi_series.empty: plot_df["CDI"] = cdi_series
+    plot_df = plot_df.dropna(how="all")
+    if plot_df.empty: return plot_df
+
+    # Base = primeiro valor válido de cada coluna (ffill antes, como no gráfico original)
+    cheio = plot_df.ffill()
+    base = cheio.apply(lambda s: s.loc[s.first_valid_index()] if s.first_valid_index() is not None else np.nan)
+    validas = base.notna() & (base != 0)
+    return ((cheio.loc[:, validas] / base[validas] - 1) * 100).ffill()
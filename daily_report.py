@@ -1,35 +1,89 @@
 import smtplib
 import json
+import logging
 import os
 import sys
+import threading
 import pandas as pd
 import requests
 import time
 import gspread
+from gspread.utils import numericise_all
 from oauth2client.service_account import ServiceAccountCredentials
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from formatacao import real_br
+from carteira import calcular_metricas, consolidar, extrair_sheet_info, montar_fiis, montar_manual, tabela_planilha, tickers_cotados
+from cache_backend import CacheMemoria
+from calendario_b3 import agora_b3
+import medicao
+from medicao import etapa
+import gravacao
+from gravacao import cassete, sem_cliente
 
 # --- CONFIGURAÇÕES ---
 try:
     EMAIL_USER = os.environ["EMAIL_USER"]
     EMAIL_PASS = os.environ["EMAIL_PASS"]
-    EMAIL_DESTINO = os.environ["EMAIL_DESTINO"]
     GOOGLE_API_KEY = os.environ["GOOGLE_API_KEY"]
     GOOGLE_CREDENTIALS = json.loads(os.environ["GOOGLE_CREDENTIALS"])
-    SHEET_ID = os.environ["SHEET_ID"]
 except KeyError as e:
     print(f"Erro Config: Variável {e} não encontrada.")
     sys.exit(1)
 
+# Uma carteira (SHEET_ID + EMAIL_DESTINO) ou várias em RELATORIO_LOTE: JSON (ou caminho de um
+# arquivo JSON) com [{"destino": ..., "sheet_id": ..., "url_fiis": ..., "url_manual": ...}, ...]
+# ou [[sheet_id, destino, url_fiis, url_manual], ...] (as URLs só são usadas no modo fresco)
+EMAIL_DESTINO = os.environ.get("EMAIL_DESTINO")
+SHEET_ID = os.environ.get("SHEET_ID")
+SHEET_URL_FIIS = os.environ.get("SHEET_URL_FIIS")
+SHEET_URL_MANUAL = os.environ.get("SHEET_URL_MANUAL")
+RELATORIO_LOTE = os.environ.get("RELATORIO_LOTE")
+RELATORIO_WORKERS = int(os.environ.get("RELATORIO_WORKERS") or 4)
+# "cache": lê o Cache_Dados gravado pelo app; "fresco": recalcula das planilhas de origem com cotações do dia
+RELATORIO_MODO = (os.environ.get("RELATORIO_MODO") or "cache").lower()
+
 MODELO_IA = "gemini-2.5-flash-lite"
+# Cache_Dados: totais na linha 2 (A:C), tabela com cabeçalho na linha 4
+FAIXA_TOTAIS = "A2:C2"
+FAIXA_TABELA = "A4:ZZ"
 
 # --- FUNÇÕES ---
-def real_br(valor):
-    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+def carregar_lote():
+    if not RELATORIO_LOTE:
+        padrao = {"sheet_id": SHEET_ID, "destino": EMAIL_DESTINO, "url_fiis": SHEET_URL_FIIS, "url_manual": SHEET_URL_MANUAL}
+        return [padrao] if EMAIL_DESTINO and (SHEET_ID or SHEET_URL_FIIS) else []
+    bruto = RELATORIO_LOTE
+    if os.path.isfile(bruto):
+        with open(bruto, encoding="utf-8") as f: bruto = f.read()
+    itens = json.loads(bruto)
+    return [i if isinstance(i, dict) else dict(zip(("sheet_id", "destino", "url_fiis", "url_manual"), i)) for i in itens]
+
+def resumo_sinais(df, cache=None):
+    # Oportunidades e radar do motor da carteira. Só no modo fresco (o Cache_Dados não traz
+    # Renda Mensal/Segmento); sem SELIC/IPCA o radar usa apenas o DY médio da carteira.
+    if "Segmento" not in df.columns: return ""
+    m = calcular_metricas(df, 0.0, 0.0, cache=cache)
+    linhas = [f"Renda mensal estimada: {real_br(m['renda_nominal'])}"]
+    if not m["df_opp"].empty:
+        linhas.append("Oportunidades: " + ", ".join(f"{a} (P/VP {p:.2f}, DY {d:.1%})" for a, p, d in zip(m["df_opp"]["Ativo"], m["df_opp"]["P/VP"], m["df_opp"]["DY (12m)"])))
+    if not m["df_alert"].empty:
+        linhas.append("Radar de atenção: " + ", ".join(f"{a} ({e})" for a, e in zip(m["df_alert"]["Ativo"], m["df_alert"]["EtiquetaRisco"])))
+    return "\n".join(linhas)
+
+@cassete("gemini_relatorio", gravar_se=lambda r: r[0] == 200)
+def _chamar_gemini(prompt):
+    # (status, texto): só o necessário para o cassete, sem guardar a chave da API
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELO_IA}:generateContent?key={GOOGLE_API_KEY}"
+    headers = {'Content-Type': 'application/json'}
+    data = {"contents": [{"parts": [{"text": prompt}]}]}
+    resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=15)
+    if resp.status_code != 200: return resp.status_code, None
+    return resp.status_code, resp.json()['candidates'][0]['content']['parts'][0]['text']
 
-def consultar_ia(df, patrimonio, investido):
+def consultar_ia(df, patrimonio, investido, sinais=""):
     print("🤖 Consultando IA...")
     try:
         # Prepara resumo para não estourar limite de texto
@@ -50,6 +104,7 @@ def consultar_ia(df, patrimonio, investido):
         Patrimônio: R$ {patrimonio:.2f}
         Investido: R$ {investido:.2f}
         Resultado: R$ {patrimonio - investido:.2f}
+        {sinais}
         
         Gere um HTML (sem tags html/body) com:
         <p><b>Diagnóstico:</b> Breve análise da saúde da carteira.</p>
@@ -57,35 +112,32 @@ def consultar_ia(df, patrimonio, investido):
         <p><b>Veredito:</b> Uma frase motivacional de fechamento.</p>
         """
         
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELO_IA}:generateContent?key={GOOGLE_API_KEY}"
-        headers = {'Content-Type': 'application/json'}
-        data = {"contents": [{"parts": [{"text": prompt}]}]}
-        
-        # Tenta enviar
-        resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=15)
-        
-        if resp.status_code == 200:
-            return resp.json()['candidates'][0]['content']['parts'][0]['text']
+        status, texto = _chamar_gemini(prompt)
+        if status == 200:
+            return texto
         else:
-            print(f"Erro IA: {resp.status_code}")
+            print(f"Erro IA: {status}")
             return "<p><i>IA indisponível no momento.</i></p>"
             
     except Exception as e:
         print(f"Exceção IA: {e}")
         return "<p><i>Análise de IA não gerada hoje.</i></p>"
 
-def ler_cache_google():
-    print("📡 Conectando ao Google Sheets...")
+def conectar_google():
+    # Um cliente autorizado para todas as carteiras do lote
+    scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/spreadsheets', "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(GOOGLE_CREDENTIALS, scope)
+    return gspread.authorize(creds)
+
+@cassete("cache_dados", chave=sem_cliente, gravar_se=lambda r: r[0])
+def ler_cache_google(client, sheet_id):
+    print(f"📡 Lendo planilha {sheet_id}...")
     try:
-        scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/spreadsheets', "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(GOOGLE_CREDENTIALS, scope)
-        client = gspread.authorize(creds)
-        
-        sh = client.open_by_key(SHEET_ID)
+        sh = client.open_by_key(sheet_id)
         ws = sh.worksheet("Cache_Dados")
         
-        # Lê Totais (Linha 2)
-        header_vals = ws.get("A2:C2")
+        # Totais e tabela numa única chamada à API
+        header_vals, tabela = ws.batch_get([FAIXA_TOTAIS, FAIXA_TABELA])
         if not header_vals: return False, None, 0, 0, "Cache vazio."
             
         totais = header_vals[0]
@@ -98,9 +150,8 @@ def ler_cache_google():
         patrimonio = clean_float(totais[1])
         investido = clean_float(totais[2])
         
-        # Lê Tabela (Linha 4 em diante)
-        dados_tabela = ws.get_all_records(head=4)
-        df = pd.DataFrame(dados_tabela)
+        # Tabela (Linha 4 em diante), no mesmo formato do get_all_records(head=4)
+        df = pd.DataFrame(_registros(tabela))
         
         return True, df, patrimonio, investido, data_att
         
@@ -108,13 +159,62 @@ def ler_cache_google():
         print(f"Erro leitura: {e}")
         return False, None, 0, 0, str(e)
 
-def enviar_email(patr, inv, data_att, texto_ia):
-    print("📧 Enviando e-mail...")
+@cassete("google_sheets_origem", chave=sem_cliente)
+def ler_planilha_origem(client, url, has_header=False):
+    sheet_id, gid = extrair_sheet_info(url)
+    sh = client.open_by_key(sheet_id)
+    ws = sh.get_worksheet_by_id(gid) if gid is not None else sh.sheet1
+    return tabela_planilha(ws.get_all_values(), has_header)
+
+def baixar_precos(tickers):
+    # Um único yf.download para todos os papéis da carteira (último fechamento disponível)
+    if not tickers: return {}
+    try:
+        import yfinance as yf
+        simbolos = [f"{t}.SA" for t in tickers]
+        dados = gravacao.chamar("yf.download", yf.download, simbolos, period="5d", progress=False)["Close"]
+        if isinstance(dados, pd.Series): dados = dados.to_frame(simbolos[0])
+        ultimos = dados.ffill().iloc[-1]
+        return {str(s).replace(".SA", ""): float(v) for s, v in ultimos.items() if pd.notna(v) and v > 0}
+    except Exception as e:
+        print(f"Erro cotações: {e}")
+        return {}
+
+def ler_carteira_fresca(client, url_fiis, url_manual=None):
+    # Mesmo cálculo do carregar_tudo do app, sem depender de alguém ter aberto o painel
+    print("📡 Recalculando carteira das planilhas de origem...")
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            f_man = pool.submit(ler_planilha_origem, client, url_manual, True) if url_manual else None
+            partes = [montar_fiis(ler_planilha_origem(client, url_fiis))]
+            if f_man: partes.append(montar_manual(f_man.result()))
+        df = consolidar(partes, baixar_precos(tickers_cotados(partes)))
+        if df.empty: return False, None, 0, 0, "Carteira vazia."
+        data_att = agora_b3().strftime("%d/%m/%Y %H:%M:%S")
+        return True, df, float(df["Valor Atual"].sum()), float(df["Total Investido"].sum()), data_att
+    except Exception as e:
+        print(f"Erro leitura: {e}")
+        return False, None, 0, 0, str(e)
+
+def _registros(linhas):
+    if not linhas: return []
+    chaves = linhas[0]
+    return [dict(zip(chaves, numericise_all(linha + [""] * (len(chaves) - len(linha))))) for linha in linhas[1:]]
+
+def conectar_smtp():
+    try:
+        s = smtplib.SMTP('smtp.gmail.com', 587, timeout=30); s.starttls()
+        s.login(EMAIL_USER, EMAIL_PASS)
+        return s
+    except Exception as e:
+        print(f"❌ Erro SMTP: {e}")
+        return None
+
+def montar_email(patr, inv, data_att):
+    # Tudo menos o texto da IA, que entra no marcador quando a resposta chegar
     lucro = patr - inv
     cor = "green" if lucro >= 0 else "red"
-    
-    # Limpa markdown da IA se houver
-    texto_ia = texto_ia.replace("```html", "").replace("```", "")
+    txt_patr, txt_inv, txt_lucro = real_br([patr, inv, lucro])
     
     html = f"""
     <html><body style="font-family:Arial, color:#333;">
@@ -124,14 +224,14 @@ def enviar_email(patr, inv, data_att, texto_ia):
     </div>
     <div style="padding:20px; border:1px solid #ddd;">
         <table style="width:100%; margin-bottom:20px; font-size:16px;">
-            <tr><td>Patrimônio:</td><td align="right"><b>{real_br(patr)}</b></td></tr>
-            <tr><td>Investido:</td><td align="right">{real_br(inv)}</td></tr>
-            <tr><td>Resultado:</td><td align="right" style="color:{cor}"><b>{real_br(lucro)}</b></td></tr>
+            <tr><td>Patrimônio:</td><td align="right"><b>{txt_patr}</b></td></tr>
+            <tr><td>Investido:</td><td align="right">{txt_inv}</td></tr>
+            <tr><td>Resultado:</td><td align="right" style="color:{cor}"><b>{txt_lucro}</b></td></tr>
         </table>
         
         <div style="background-color:#f0fdfa; padding:15px; border-left: 4px solid #0f766e; border-radius:4px; margin-top:20px;">
             <h3 style="margin-top:0; color:#0f766e; font-size:16px;">🤖 Análise do Assistente</h3>
-            {texto_ia}
+            <!--IA-->
         </div>
         
         <br><center>
@@ -142,26 +242,110 @@ def enviar_email(patr, inv, data_att, texto_ia):
     </div>
     </body></html>
     """
+    return html, f"📊 Morning Call: {txt_patr}"
+
+class ConexaoSmtp:
+    """Uma conexão SMTP (um login) para todos os e-mails do lote; o lock serializa
+    o uso, já que smtplib não é thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.smtp = None
+
+    def conectar(self):
+        if gravacao.sem_rede(): return True  # modo reproduzir: nada de SMTP
+        with self.lock:
+            if self.smtp is None: self.smtp = conectar_smtp()
+            return self.smtp is not None
+
+    def enviar(self, msg):
+        if gravacao.sem_rede():
+            print(f"📭 Modo reproduzir: e-mail para {msg['To']} não enviado")
+            return True
+        with self.lock:
+            for _ in range(2):
+                if self.smtp is None: self.smtp = conectar_smtp()
+                if self.smtp is None: return False
+                try:
+                    self.smtp.send_message(msg)
+                    return True
+                except smtplib.SMTPServerDisconnected:
+                    self.smtp = None  # servidor derrubou a conexão ociosa: reabre uma vez
+            return False
+
+    def fechar(self):
+        with self.lock:
+            if self.smtp is None: return
+            try: self.smtp.quit()
+            except Exception: pass
+            self.smtp = None
+
+def enviar_email(html, assunto, texto_ia, conexao, destino):
+    print(f"📧 Enviando e-mail para {destino}...")
+    # Limpa markdown da IA se houver
+    texto_ia = texto_ia.replace("```html", "").replace("```", "")
     
     msg = MIMEMultipart()
     msg['From'] = f"Carteira Bot <{EMAIL_USER}>"
-    msg['To'] = EMAIL_DESTINO
-    msg['Subject'] = f"📊 Morning Call: {real_br(patr)}"
-    msg.attach(MIMEText(html, 'html'))
+    msg['To'] = destino
+    msg['Subject'] = assunto
+    msg.attach(MIMEText(html.replace("<!--IA-->", texto_ia), 'html'))
     
     try:
-        s = smtplib.SMTP('smtp.gmail.com', 587); s.starttls()
-        s.login(EMAIL_USER, EMAIL_PASS)
-        s.send_message(msg); s.quit()
-        print("✅ E-mail enviado!")
-    except Exception as e: print(f"❌ Erro envio: {e}")
+        if conexao.enviar(msg):
+            print(f"✅ E-mail enviado para {destino}!")
+            return True
+    except Exception as e: print(f"❌ Erro envio ({destino}): {e}")
+    return False
+
+def _em_paralelo(crono, nome, fn, *args):
+    with etapa(nome, crono): return fn(*args)
+
+def processar_carteira(client, conexao, carteira, crono, cache=None):
+    destino = carteira["destino"]
+    if client is None and not gravacao.sem_rede():
+        # Sem autenticação no Google não há como ler a planilha (no modo reproduzir o cassete dispensa o cliente)
+        print(f"Falha ao ler dados ({destino}): sem acesso ao Google Sheets")
+        return False
+    with etapa(f"{destino}: dados", crono):
+        if RELATORIO_MODO == "fresco":
+            sucesso, df, p, i, d = ler_carteira_fresca(client, carteira.get("url_fiis"), carteira.get("url_manual"))
+        else:
+            sucesso, df, p, i, d = ler_cache_google(client, carteira.get("sheet_id"))
+    if not sucesso:
+        print(f"Falha ao ler dados ({destino}): {d}")
+        return False
+    # O template (tudo menos o texto da IA) custa ~0ms; a IA começa logo em seguida
+    html, assunto = montar_email(p, i, d)
+    with etapa(f"{destino}: Gemini", crono):
+        texto = consultar_ia(df, p, i, resumo_sinais(df, cache))
+    with etapa(f"{destino}: envio", crono):
+        return enviar_email(html, assunto, texto, conexao, destino)
+
+def executar(lote, workers=RELATORIO_WORKERS):
+    # Carteiras em paralelo (pool limitado) sobre um cliente gspread e uma conexão
+    # SMTP; o login SMTP corre junto com a leitura das primeiras planilhas
+    crono = medicao.iniciar("relatorio")
+    conexao = ConexaoSmtp()
+    cache = CacheMemoria()  # métricas por conteúdo: carteiras repetidas no lote calculam uma vez
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(lote))) + 1) as pool:
+        pool.submit(_em_paralelo, crono, "SMTP: conexão", conexao.conectar)
+        try:
+            with etapa("Google: autenticação"):
+                client = conectar_google()
+        except Exception as e:
+            print(f"Erro autenticação Google: {e}")
+            client = None
+        resultados = list(pool.map(lambda carteira: processar_carteira(client, conexao, carteira, crono, cache), lote))
+    conexao.fechar()
+    medicao.finalizar()
+    print(f"📬 {sum(resultados)}/{len(lote)} relatório(s) enviado(s).")
+    return resultados
 
 if __name__ == "__main__":
-    sucesso, df, p, i, d = ler_cache_google()
-    if sucesso:
-        # Gera o texto da IA usando os dados lidos
-        texto = consultar_ia(df, p, i)
-        # Envia tudo
-        enviar_email(p, i, d, texto)
-    else:
-        print(f"Falha ao ler dados: {d}")
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    lote = carregar_lote()
+    if not lote:
+        print("Erro Config: defina SHEET_ID e EMAIL_DESTINO ou RELATORIO_LOTE.")
+        sys.exit(1)
+    executar(lote)
\ No newline at end of file
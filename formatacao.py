@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Formatação pt-BR (R$ 1.234,56 / 12,34%) de valores soltos ou de colunas inteiras.
+# Em lote tudo é numpy: arredonda para centavos em int64, monta milhares com
+# aritmética inteira e junta os pedaços com np.char (NaN vira "-"). Só empates de
+# arredondamento e inf passam pelo format do Python, para o texto sair idêntico ao
+# do valor solto; `mascarar` segue o modo privacidade.
+
+MASCARA = "••••••"
+_TROCA_BR = str.maketrans(",.", ".,")
+
+
+def _eh_lote(valor):
+    return isinstance(valor, (pd.Series, pd.Index, np.ndarray, list, tuple))
+
+
+def _milhares(inteiro):
+    # 1234567 -> "1.234.567", grupo a grupo (poucas voltas: uma por 3 dígitos)
+    texto = (inteiro % 1000).astype(str)
+    resto, largura = inteiro // 1000, 3
+    while resto.any():
+        tem = resto > 0
+        texto = np.where(tem, np.char.add(np.char.add((resto % 1000).astype(str), "."), np.char.zfill(texto, largura)), texto)
+        resto, largura = resto // 1000, largura + 4
+    return texto
+
+
+def _em_lote(valores, molde, mascarar, prefixo="", sufixo="", escala=1, milhar=True):
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(np.asarray(valores).ravel())
+    if mascarar:
+        textos = np.full(len(serie), MASCARA, dtype=object)
+    elif serie.empty:
+        textos = np.empty(0, dtype=object)
+    else:
+        numeros = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", over="ignore"):
+            centavos = np.abs(numeros) * (escala * 100)
+            inteiros = np.rint(centavos)
+            # Perto de x,5 centavo o produto em float pode arredondar diferente do format: fica com o format
+            avulsos = ~np.isfinite(centavos) | (centavos >= 2.0 ** 53) | (np.abs(centavos - np.floor(centavos) - 0.5) < 1e-6)
+        c = np.where(avulsos, 0, inteiros).astype(np.int64)
+        corpo = _milhares(c // 100) if milhar else (c // 100).astype(str)
+        corpo = np.char.add(np.char.add(corpo, ","), np.char.zfill((c % 100).astype(str), 2))
+        corpo = np.char.add(np.where(np.signbit(numeros), "-", ""), corpo)
+        textos = np.char.add(np.char.add(prefixo, corpo), sufixo).astype(object)
+        for i in np.flatnonzero(avulsos & ~np.isnan(numeros)):
+            textos[i] = molde.format(numeros[i]).translate(_TROCA_BR)
+        textos[np.isnan(numeros)] = "-"
+    if isinstance(valores, pd.Series): return pd.Series(textos, index=valores.index, name=valores.name)
+    return textos
+
+
+def real_br(valor, mascarar=False):
+    if _eh_lote(valor): return _em_lote(valor, "R$ {:,.2f}", mascarar, prefixo="R$ ")
+    if mascarar: return MASCARA
+    return f"R$ {valor:,.2f}".translate(_TROCA_BR) if isinstance(valor, (int, float, np.number)) else valor
+
+
+def pct_br(valor, mascarar=False):
+    if _eh_lote(valor): return _em_lote(valor, "{:.2%}", mascarar, sufixo="%", escala=100, milhar=False)
+    if mascarar: return MASCARA
+    return f"{valor:.2%}".translate(_TROCA_BR) if isinstance(valor, (int, float, np.number)) else valor
@@ -0,0 +1,140 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import threading
+
+# Gravação/reprodução ("cassete") das chamadas externas: investidor10, yfinance,
+# BCB/BrasilAPI, Google Sheets, Gemini e YouTube. Com FIXTURES_MODO:
+#   ""           desligado (padrão): chama a função normalmente
+#   "gravar"     chama a função e guarda o resultado em disco
+#   "reproduzir" só lê do disco, sem rede; chamada não gravada levanta FixtureAusente
+#   "misto"      lê do disco quando existe, senão chama e grava
+# Cada resultado fica em FIXTURES_DIR/<nome>/<sha1 dos argumentos>.pkl.
+# Exceção não grava. Resultado que `gravar_se(valor)` recusa (None, DataFrame vazio,
+# fallback...) é gravado marcado como falha: o reproduzir devolve o mesmo sentinela
+# (a sessão sai igual à gravada) e o misto trata a marca como ausente e busca de novo.
+# Escritas externas (snapshot no Google Sheets, envio SMTP) consultam `sem_rede()`
+# e viram no-op no modo reproduzir.
+
+MODO = (os.environ.get("FIXTURES_MODO") or "").lower()
+PASTA = os.environ.get("FIXTURES_DIR") or "fixtures_gravadas"
+MODOS = ("", "gravar", "reproduzir", "misto")
+
+_lock = threading.Lock()
+
+
+class FixtureAusente(LookupError):
+    """Modo reproduzir e nenhuma gravação para esta chamada."""
+
+
+class _Falha:
+    """Sentinela de falha gravado com marca (ver gravar_se)."""
+    __slots__ = ("valor",)
+
+    def __init__(self, valor): self.valor = valor
+
+
+def configurar(modo=None, pasta=None):
+    global MODO, PASTA
+    if modo is not None:
+        if modo not in MODOS: raise ValueError(f"FIXTURES_MODO inválido: {modo!r} (use um de {MODOS})")
+        MODO = modo
+    if pasta is not None: PASTA = pasta
+
+
+def _caminho(nome, chave):
+    digest = hashlib.sha1(repr(chave).encode("utf-8")).hexdigest()
+    return os.path.join(PASTA, re.sub(r"[^\w.-]+", "_", nome), f"{digest}.pkl")
+
+
+def _ler(caminho):
+    try:
+        with open(caminho, "rb") as f: return True, pickle.load(f)
+    except FileNotFoundError:
+        return False, None
+
+
+def _gravar(caminho, valor):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f: pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with _lock: os.replace(temporario, caminho)  # escrita atômica: leitor nunca vê arquivo pela metade
+
+
+def _reproduzir(nome, chave):
+    """(achou, valor) conforme o modo; levanta FixtureAusente no modo reproduzir."""
+    if MODO == "gravar": return False, None
+    achou, valor = _ler(_caminho(nome, chave))
+    if not achou and MODO == "reproduzir":
+        raise FixtureAusente(f"{nome}: sem gravação para {chave!r:.200}")
+    if isinstance(valor, _Falha):
+        if MODO == "misto": return False, None  # falha gravada: tenta a rede de novo
+        return True, valor.valor
+    return achou, valor
+
+
+def sem_rede():
+    """Modo reproduzir: nada sai para a rede, nem as escritas."""
+    return MODO == "reproduzir"
+
+
+def resultado_valido(valor):
+    # Padrão de gravar_se: None e coleções/DataFrames vazios contam como falha
+    if valor is None: return False
+    if hasattr(valor, "empty"): return not valor.empty
+    if isinstance(valor, (dict, list, tuple, str)): return len(valor) > 0
+    return True
+
+
+def _guardar(nome, chave, valor, gravar_se):
+    _gravar(_caminho(nome, chave), valor if gravar_se(valor) else _Falha(valor))
+    return valor
+
+
+def _chave_padrao(args, kwargs):
+    return args, tuple(sorted(kwargs.items()))
+
+
+def chamar(nome, fn, *args, gravar_se=resultado_valido, **kwargs):
+    """Chamada externa avulsa (ex.: yf.download dentro de uma função maior)."""
+    if not MODO: return fn(*args, **kwargs)
+    chave = _chave_padrao(args, kwargs)
+    achou, valor = _reproduzir(nome, chave)
+    if achou: return valor
+    return _guardar(nome, chave, fn(*args, **kwargs), gravar_se)
+
+
+def cassete(nome, chave=None, gravar_se=resultado_valido):
+    """Decorator de função com I/O externo (síncrona ou async). `chave(args, kwargs)`
+    escolhe o que identifica a chamada (ex.: ignorar o cliente autenticado) e
+    `gravar_se(valor)` diz se o resultado é bom ou um sentinela de falha (gravado com marca)."""
+    chave = chave or _chave_padrao
+
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                if not MODO: return await fn(*args, **kwargs)
+                k = chave(args, kwargs)
+                achou, valor = _reproduzir(nome, k)
+                if achou: return valor
+                return _guardar(nome, k, await fn(*args, **kwargs), gravar_se)
+            return wrapper_async
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not MODO: return fn(*args, **kwargs)
+            k = chave(args, kwargs)
+            achou, valor = _reproduzir(nome, k)
+            if achou: return valor
+            return _guardar(nome, k, fn(*args, **kwargs), gravar_se)
+        return wrapper
+    return deco
+
+
+def sem_cliente(args, kwargs):
+    # Primeiro argumento é o cliente (gspread/httpx): não entra na chave
+    return _chave_padrao(args[1:], kwargs)
@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+import time
+
+# Campos numéricos guardados na série histórica (texto como setor/Data Com fica só no cache)
+CAMPOS_HISTORICO = ("preco", "vp", "pvp", "dy", "ultimo_rendimento", "liquidez")
+
+
+class HistoricoStore:
+    """Série histórica append-only dos indicadores, em SQLite indexado por (ticker, ts)."""
+
+    def __init__(self, caminho="historico.sqlite"):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        colunas = ", ".join(f"{c} REAL" for c in CAMPOS_HISTORICO)
+        # WITHOUT ROWID: a própria chave (ticker, ts) é o índice clusterizado
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS historico (ticker TEXT NOT NULL, ts INTEGER NOT NULL, {colunas}, "
+            "PRIMARY KEY (ticker, ts)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def registrar_lote(self, linhas):
+        """linhas: iterável de (ticker, timestamp, dados)."""
+        registros = [
+            (t.upper(), int(ts), *(_num(d.get(c)) for c in CAMPOS_HISTORICO))
+            for t, ts, d in linhas if d
+        ]
+        if not registros: return 0
+        marcadores = ", ".join("?" * (2 + len(CAMPOS_HISTORICO)))
+        with self.lock:
+            self.conn.executemany(f"INSERT OR REPLACE INTO historico VALUES ({marcadores})", registros)
+            self.conn.commit()
+        return len(registros)
+
+    def registrar(self, ticker, ts, dados):
+        return self.registrar_lote([(ticker, ts, dados)])
+
+    def consultar(self, ticker, inicio=None, fim=None, pontos=None, campos=CAMPOS_HISTORICO):
+        campos = [c for c in campos if c in CAMPOS_HISTORICO] or list(CAMPOS_HISTORICO)
+        inicio = int(inicio) if inicio is not None else 0
+        fim = int(fim) if fim is not None else int(time.time()) + 1
+        filtro = "WHERE ticker = ? AND ts BETWEEN ? AND ?"
+        args = (ticker.upper(), inicio, fim)
+
+        with self.lock:
+            total, ts_min, ts_max = self.conn.execute(f"SELECT COUNT(*), MIN(ts), MAX(ts) FROM historico {filtro}", args).fetchone()
+            if not total: return []
+            if not pontos or total <= pontos:
+                sql = f"SELECT ts, {', '.join(campos)} FROM historico {filtro} ORDER BY ts"
+                linhas = self.conn.execute(sql, args).fetchall()
+            else:
+                # Downsampling: média por janela de largura fixa, feito no próprio SQLite
+                largura = max(1, -(-(ts_max - ts_min + 1) // pontos))
+                medias = ", ".join(f"AVG({c})" for c in campos)
+                sql = (f"SELECT CAST(AVG(ts) AS INTEGER), {medias} FROM historico {filtro} "
+                       f"GROUP BY (ts - ?) / ? ORDER BY 1")
+                linhas = self.conn.execute(sql, args + (ts_min, largura)).fetchall()
+
+        return [{"ts": linha[0], **dict(zip(campos, linha[1:]))} for linha in linhas]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _num(valor):
+    try: return float(valor) if valor is not None else None
+    except (TypeError, ValueError): return None
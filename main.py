@@ -1,33 +1,141 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Header, Response
+from fastapi.responses import StreamingResponse, JSONResponse
 from contextlib import asynccontextmanager
-from apscheduler.schedulers.background import BackgroundScheduler
+from typing import Optional
+import asyncio
 import logging
 import time
-import requests
+import csv
+import io
+import json
+import os
 import re
+import zlib
+from datetime import datetime
+import httpx
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from historico import HistoricoStore, CAMPOS_HISTORICO
+from calendario_b3 import agora_b3, fase_mercado
+from cache_backend import criar_backend
+from gravacao import cassete
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class RespostaJSON(JSONResponse):
+    # orjson quando disponível: serialização bem mais barata que o json da stdlib
+    def render(self, content):
+        if orjson: return orjson.dumps(content)
+        return super().render(content)
 
 # --- CONFIGURAÇÕES ---
 BASE_URL = "https://investidor10.com.br/fiis"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-CACHE_MEMORIA = {}
+# Backend do cache: "memoria" (por processo), "sqlite" (compartilhado entre workers do host) ou "redis"
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memoria")
+CACHE_SQLITE = os.environ.get("CACHE_SQLITE", "cache.sqlite")
+REDIS_URL = os.environ.get("REDIS_URL")
+MEIA_VIDA_ACESSOS = 24 * 3600
+_criar_mapa, lideranca, ACESSOS = criar_backend(CACHE_BACKEND, CACHE_SQLITE, REDIS_URL, meia_vida=MEIA_VIDA_ACESSOS)
+# sqlite/redis fazem I/O bloqueante (lock de escrita, round-trip de rede): fora do event loop
+BACKEND_BLOQUEANTE = CACHE_BACKEND.lower() in ("sqlite", "redis")
+
+CACHE_MEMORIA = _criar_mapa("cache")
+
+async def no_backend(fn, *args):
+    if not BACKEND_BLOQUEANTE: return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+# Campos extraídos pelo scraper (ordem usada também nas exportações)
+CAMPOS_DADOS = ("preco", "vp", "pvp", "dy", "ultimo_rendimento", "liquidez", "setor", "data_com")
+CAMPOS_TEXTO = ("setor", "data_com")
+
+PAUSA_ENTRE_FUNDOS = 2
+
+# Agendador por prioridade: o intervalo de refresh depende da frequência de leitura
+# e do calendário da B3 (refresh intradiário só durante o pregão, uma consolidação
+# após o fechamento e nada em fins de semana/feriados)
+TICK_AGENDADOR = 5 * 60
+# (score mínimo, intervalo no pregão) — o primeiro que casar vence; None = só na consolidação
+FAIXAS_PRIORIDADE = (
+    (5.0, 15 * 60),    # quente
+    (1.0, 1 * 3600),   # morno
+    (0.0, None),       # frio
+)
+DESCARTE_SEM_ACESSO = 30 * 24 * 3600
+# A partir de quantos fundos vencidos vale pagar as páginas de listagem
+LIMIAR_BULK = 10
+# Validade do lease de líder do agendador (renovado a cada tick e, durante um job longo,
+# a cada RENOVACAO_LEASE: a consolidação de centenas de fundos passa de 30 min)
+LEASE_LIDER = 30 * 60
+RENOVACAO_LEASE = LEASE_LIDER / 3
+# Leituras de /dados acumulam no processo e vão ao backend em lote a cada FLUSH_ACESSOS
+FLUSH_ACESSOS = 10
+# max-age quando não há refresh previsto (fora do pregão / fundos frios)
+MAX_AGE_FORA_PREGAO = 3600
+
+# Modo bulk: indicadores de muitos fundos pelas páginas de listagem/ranking (paginadas)
+MODO_BULK = os.environ.get("MODO_BULK", "1") == "1"
+CAMINHO_LISTAGEM = "ranking"
+LISTAGEM_MAX_PAGINAS = 30
+PAUSA_ENTRE_PAGINAS = 1
+# Sem estes campos na listagem, o fundo cai no fallback da página individual
+CAMPOS_ESSENCIAIS = ("preco", "vp", "dy")
+# A listagem não traz Data Com (e nem sempre o último rendimento): quando a Data Com guardada
+# já passou do último ciclo de pagamento, o fundo volta à página individual — no máximo uma
+# vez por REFETCH_PAGINA, para fundos que não publicam Data Com não irem sempre para ela
+CICLO_PAGAMENTO = 35 * 24 * 3600
+REFETCH_PAGINA = 24 * 3600
+
+# Série histórica de cada refresh (SQLite local)
+HISTORICO_DB = os.environ.get("HISTORICO_DB", "historico.sqlite")
+HISTORICO_MAX_PONTOS = 2000
+historico: Optional[HistoricoStore] = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api-investidor10")
 
-# --- SESSÃO HTTP ---
-def create_session():
-    s = requests.Session()
-    s.headers.update({"User-Agent": USER_AGENT})
-    retry = Retry(total=3, backoff_factor=1, status_forcelist=(403, 429, 500, 502))
-    adapter = HTTPAdapter(max_retries=retry)
-    s.mount("https://", adapter)
-    return s
+# --- CLIENTE HTTP (compartilhado, criado no lifespan) ---
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+HTTP_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+RETRY_STATUS = (403, 429, 500, 502)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 1
 
-session = create_session()
+http_client: Optional[httpx.AsyncClient] = None
+
+def create_client():
+    try:
+        import h2  # noqa: F401
+        usar_http2 = True
+    except ImportError:
+        usar_http2 = False
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        limits=HTTP_LIMITS,
+        timeout=HTTP_TIMEOUT,
+        http2=usar_http2,
+        follow_redirects=True,
+    )
+
+async def http_get(url):
+    # Mesmo comportamento do antigo Retry(total=3, backoff_factor=1) do requests
+    for tentativa in range(RETRY_TOTAL + 1):
+        try:
+            resp = await http_client.get(url)
+            if resp.status_code not in RETRY_STATUS or tentativa == RETRY_TOTAL:
+                return resp
+        except httpx.TransportError:
+            if tentativa == RETRY_TOTAL: raise
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** tentativa))
 
 # --- LIMPEZA DE DADOS ---
 def limpar_valor(texto):
@@ -41,110 +149,504 @@ def limpar_valor(texto):
     except:
         return None
 
-# --- SCRAPER ATUALIZADO (VP + DY) ---
-def scrape_dados(ticker: str):
+MULTIPLICADORES = {"K": 1e3, "MIL": 1e3, "M": 1e6, "MI": 1e6, "MILHÕES": 1e6, "B": 1e9, "BI": 1e9, "BILHÕES": 1e9}
+
+def limpar_valor_abreviado(texto):
+    """Converte 'R$ 4,12 M' ou '850,3 K' para float"""
+    if not texto: return None
+    match = re.search(r"([\d.,]+)\s*([A-Za-zÀ-ú]*)", texto.replace("R$", ""))
+    if not match: return None
+    valor = limpar_valor(match.group(1))
+    if valor is None: return None
+    return valor * MULTIPLICADORES.get(match.group(2).upper(), 1)
+
+# --- SCRAPER ATUALIZADO (INDICADORES COMPLETOS) ---
+@cassete("investidor10")
+async def scrape_dados(ticker: str):
     ticker = ticker.lower().strip()
     url = f"{BASE_URL}/{ticker}/"
     
-    dados = {"vp": None, "dy": None}
-    
     try:
-        resp = session.get(url, timeout=15)
-        if resp.status_code != 200 or resp.url == "https://investidor10.com.br/":
+        resp = await http_get(url)
+        if resp.status_code != 200 or str(resp.url) == "https://investidor10.com.br/":
             return None
-            
-        soup = BeautifulSoup(resp.text, "html.parser")
-        
-        # 1. BUSCAR VP (Nas células brancas - div.cell)
-        cards_cell = soup.select("div.cell")
-        for card in cards_cell:
-            desc = card.select_one("div.desc")
-            if desc and ("PATRIMONIAL P/ COTA" in desc.get_text(strip=True).upper()):
-                val = card.select_one("div.value span")
-                if val: dados["vp"] = limpar_valor(val.get_text())
-
-        # 2. BUSCAR DY (Nos cards coloridos do topo - div._card)
-        # Baseado na sua imagem 4: div._card -> header "DY (12M)" -> body value
-        cards_top = soup.select("div._card")
-        for card in cards_top:
-            header = card.select_one("div._card-header")
-            if header and "DY" in header.get_text(strip=True).upper():
-                body = card.select_one("div._card-body")
-                if body:
-                    # Às vezes o valor está num span direto ou dentro de outro elemento
-                    dados["dy"] = limpar_valor(body.get_text())
-
-        # 3. FALLBACK (Tabela - caso falhe nos cards)
-        if dados["vp"] is None or dados["dy"] is None:
-            tabela = soup.select_one("#table-indicators")
-            if tabela:
-                for tr in tabela.select("tr"):
-                    cols = tr.select("td")
-                    if len(cols) >= 2:
-                        key = cols[0].get_text(strip=True).upper()
-                        val = cols[1].get_text(strip=True)
-                        
-                        if "PATRIMONIAL P/ COTA" in key and dados["vp"] is None:
-                            dados["vp"] = limpar_valor(val)
-                        if "DIVIDEND YIELD" in key and dados["dy"] is None:
-                            dados["dy"] = limpar_valor(val)
-
-        # 4. ULTIMATO (Busca textual bruta - resolve casos como HGRU11/TRXF11)
-                # Se ainda não achou VP, procura qualquer texto "VPA" ou "Patrimonial" e pega o próximo número
-                if dados["vp"] is None:
-                    # Pega todos os textos da página que parecem dinheiro
-                    textos = soup.get_text(" ", strip=True)
-                    # Removemos excesso de espaço
-                    import re
-                    # Regex procura: "Patrimonial p/ cota R$ 123,45" (com variações de espaço)
-                    match = re.search(r'(?:Patrimonial\s*p/?\s*cota|VPA).*?R\$\s*([\d.,]+)', textos, re.IGNORECASE)
-                    if match:
-                        dados["vp"] = limpar_valor(match.group(1))
+        # Parsing é CPU-bound: roda fora do event loop
+        return await asyncio.to_thread(extrair_dados, resp.text)
+
+    except Exception as e:
+        logger.error(f"Erro scraper {ticker}: {e}")
+        return None
+
+def _buscar(mapa, *chaves):
+    for rotulo, valor in mapa.items():
+        if any(c in rotulo for c in chaves): return valor
+    return None
+
+def extrair_dados(html: str):
+    dados = dict.fromkeys(CAMPOS_DADOS)
+    
+    try:
+        soup = BeautifulSoup(html, "html.parser")
+
+        # Uma única varredura por bloco da página: rótulo -> texto
+        # 1. Cards coloridos do topo (div._card): cotação, DY, P/VP, liquidez
+        cards = {}
+        for card in soup.select("div._card"):
+            header = card.select_one("div._card-header"); body = card.select_one("div._card-body")
+            if header and body: cards.setdefault(header.get_text(" ", strip=True).upper(), body.get_text(" ", strip=True))
+
+        # 2. Células brancas (div.cell): VP por cota, segmento, último rendimento
+        cells = {}
+        for card in soup.select("div.cell"):
+            desc = card.select_one("div.desc"); val = card.select_one("div.value")
+            if desc and val: cells.setdefault(desc.get_text(" ", strip=True).upper(), val.get_text(" ", strip=True))
+
+        # 3. Tabela de indicadores (fallback)
+        tabela = {}
+        for tr in soup.select("#table-indicators tr"):
+            cols = tr.select("td")
+            if len(cols) >= 2: tabela.setdefault(cols[0].get_text(strip=True).upper(), cols[1].get_text(strip=True))
+
+        dados["preco"] = limpar_valor(_buscar(cards, "COTAÇÃO"))
+        dados["vp"] = limpar_valor(_buscar(cells, "PATRIMONIAL P/ COTA") or _buscar(tabela, "PATRIMONIAL P/ COTA"))
+        dados["pvp"] = limpar_valor(_buscar(cards, "P/VP") or _buscar(tabela, "P/VP"))
+        dados["dy"] = limpar_valor(_buscar(cards, "DY (") or _buscar(tabela, "DIVIDEND YIELD"))
+        dados["ultimo_rendimento"] = limpar_valor(_buscar(cells, "ÚLTIMO RENDIMENTO") or _buscar(cards, "ÚLTIMO RENDIMENTO"))
+        dados["liquidez"] = limpar_valor_abreviado(_buscar(cards, "LIQUIDEZ") or _buscar(tabela, "LIQUIDEZ"))
+        dados["setor"] = _buscar(cells, "SEGMENTO")
+
+        # 4. Histórico de proventos: Data Com e valor do último pagamento
+        ultimo = soup.select_one("#table-dividends-history tbody tr")
+        if ultimo:
+            cols = [td.get_text(strip=True) for td in ultimo.select("td")]
+            if len(cols) >= 4:
+                dados["data_com"] = cols[1] or None
+                if dados["ultimo_rendimento"] is None: dados["ultimo_rendimento"] = limpar_valor(cols[3])
+
+        # 5. ULTIMATO (Busca textual bruta - resolve casos como HGRU11/TRXF11)
+        # Se ainda não achou VP, procura qualquer texto "VPA" ou "Patrimonial" e pega o próximo número
+        if dados["vp"] is None:
+            textos = soup.get_text(" ", strip=True)
+            # Regex procura: "Patrimonial p/ cota R$ 123,45" (com variações de espaço)
+            match = re.search(r'(?:Patrimonial\s*p/?\s*cota|VPA).*?R\$\s*([\d.,]+)', textos, re.IGNORECASE)
+            if match:
+                dados["vp"] = limpar_valor(match.group(1))
+
+        if dados["pvp"] is None and dados["preco"] and dados["vp"]:
+            dados["pvp"] = round(dados["preco"] / dados["vp"], 2)
 
         return dados
 
     except Exception as e:
-        logger.error(f"Erro scraper {ticker}: {e}")
+        logger.error(f"Erro parser: {e}")
         return None
 
+# --- SCRAPER DE LISTAGEM (BULK) ---
+# Cabeçalho da tabela -> campo (primeira chave que casar vence)
+COLUNAS_LISTAGEM = (
+    ("ticker", ("ATIVO", "TICKER", "FUNDO")),
+    ("pvp", ("P/VP",)),
+    ("vp", ("PATRIMONIAL P/ COTA", "VPA", "VP/COTA")),
+    ("preco", ("COTAÇÃO", "PREÇO")),
+    ("dy", ("DY", "DIVIDEND YIELD")),
+    ("ultimo_rendimento", ("ÚLTIMO RENDIMENTO",)),
+    ("liquidez", ("LIQUIDEZ",)),
+    ("setor", ("SEGMENTO", "SETOR")),
+)
+
+def extrair_listagem(html: str):
+    resultado = {}
+    try:
+        soup = BeautifulSoup(html, "html.parser")
+        for tabela in soup.select("table"):
+            indices = {}
+            for i, th in enumerate(tabela.select("thead th")):
+                rotulo = th.get_text(" ", strip=True).upper()
+                campo = next((c for c, chaves in COLUNAS_LISTAGEM if c not in indices and any(k in rotulo for k in chaves)), None)
+                if campo: indices[campo] = i
+            if "ticker" not in indices: continue
+
+            for tr in tabela.select("tbody tr"):
+                cols = [td.get_text(" ", strip=True) for td in tr.select("td")]
+                if len(cols) <= indices["ticker"]: continue
+                match = re.search(r"[A-Z]{4}11B?", cols[indices["ticker"]].upper())
+                if not match: continue
+                dados = dict.fromkeys(CAMPOS_DADOS)
+                for campo, i in indices.items():
+                    if campo == "ticker" or i >= len(cols): continue
+                    if campo in CAMPOS_TEXTO: dados[campo] = cols[i] or None
+                    elif campo == "liquidez": dados[campo] = limpar_valor_abreviado(cols[i])
+                    else: dados[campo] = limpar_valor(cols[i])
+                if dados["vp"] is None and dados["preco"] and dados["pvp"]:
+                    dados["vp"] = round(dados["preco"] / dados["pvp"], 2)
+                resultado[match.group(0)] = dados
+    except Exception as e:
+        logger.error(f"Erro parser listagem: {e}")
+    return resultado
+
+@cassete("investidor10_listagem")
+async def scrape_listagem():
+    todos = {}
+    for pagina in range(1, LISTAGEM_MAX_PAGINAS + 1):
+        url = f"{BASE_URL}/{CAMINHO_LISTAGEM}/?page={pagina}"
+        try:
+            resp = await http_get(url)
+            if resp.status_code != 200: break
+            lote = await asyncio.to_thread(extrair_listagem, resp.text)
+        except Exception as e:
+            logger.error(f"Erro listagem página {pagina}: {e}")
+            break
+        novos = {t: d for t, d in lote.items() if t not in todos}
+        # Página vazia ou repetida = fim da paginação
+        if not novos: break
+        todos.update(novos)
+        await asyncio.sleep(PAUSA_ENTRE_PAGINAS)
+    return todos
+
+def data_com_vencida(dados, agora):
+    try: data_com = datetime.strptime((dados or {}).get("data_com") or "", "%d/%m/%Y")
+    except ValueError: return True
+    return agora - data_com.timestamp() > CICLO_PAGAMENTO
+
+def precisa_pagina(entrada, agora):
+    return data_com_vencida(entrada.get("dados"), agora) and agora - entrada.get("pagina", 0) >= REFETCH_PAGINA
+
+def mesclar_dados(anterior, novos):
+    # Campos que a listagem não traz (ex.: Data Com) preservam o último valor conhecido
+    base = dict(anterior or {})
+    base.update({k: v for k, v in novos.items() if v is not None})
+    return base
+
+# --- ESTATÍSTICAS DE ACESSO ---
+# ACESSOS: ticker -> {"score": contagem com decaimento exponencial, "ultimo": timestamp do último acesso}
+# (no mesmo backend do cache, para o líder enxergar as leituras de todos os workers; o
+# incremento é atômico no backend, ver cache_backend.AcessosMemoria)
+_ACESSOS_PENDENTES = {}  # ticker -> [instantes ainda não gravados]
+
+def registrar_acesso(ticker, agora=None):
+    _ACESSOS_PENDENTES.setdefault(ticker, []).append(agora or time.time())
+
+async def gravar_acessos():
+    if not _ACESSOS_PENDENTES: return
+    lote = [(t, instante) for t, instantes in _ACESSOS_PENDENTES.items() for instante in instantes]
+    _ACESSOS_PENDENTES.clear()
+    try: await no_backend(ACESSOS.incrementar, lote)
+    except Exception as e: logger.error(f"Erro ao gravar acessos: {e}")
+
+async def loop_acessos():
+    while True:
+        await asyncio.sleep(FLUSH_ACESSOS)
+        await gravar_acessos()
+
+def score_atual(info, agora):
+    return info["score"] * 0.5 ** (max(agora - info["ultimo"], 0) / MEIA_VIDA_ACESSOS)
+
+def intervalo_refresh(ticker, agora, acessos=None):
+    info = (acessos if acessos is not None else ACESSOS).get(ticker)
+    score = score_atual(info, agora) if info else 0.0
+    for minimo, intervalo in FAIXAS_PRIORIDADE:
+        if score >= minimo: return intervalo
+    return None
+
+def descartar_inativos(agora):
+    removidos = []
+    acessos = dict(ACESSOS.items())
+    for t, entrada in list(CACHE_MEMORIA.items()):
+        info = acessos.get(t)
+        ultimo = info["ultimo"] if info else entrada["timestamp"]
+        if agora - ultimo > DESCARTE_SEM_ACESSO:
+            CACHE_MEMORIA.pop(t, None); ACESSOS.pop(t, None)
+            removidos.append(t)
+    if removidos: logger.info(f"🗑️ Descartados {len(removidos)} fundos sem acesso")
+    return removidos
+
+def selecionar_vencidos(agora):
+    vencidos = []
+    acessos = dict(ACESSOS.items())
+    for t, entrada in list(CACHE_MEMORIA.items()):
+        intervalo = intervalo_refresh(t, agora, acessos)
+        if intervalo is not None and agora - entrada["timestamp"] >= intervalo:
+            vencidos.append(t)
+    # Mais lidos primeiro: o orçamento de requisições vai para onde há leitura
+    vencidos.sort(key=lambda t: score_atual(acessos[t], agora) if t in acessos else 0.0, reverse=True)
+    return vencidos
+
 # --- AGENDADOR ---
-def atualizar_cache_job():
-    lista = list(CACHE_MEMORIA.keys())
+def aplicar_listagem(lista, listagem, agora):
+    """Grava no cache os fundos cobertos pela listagem; devolve (atualizados, pendentes)."""
+    atualizados, pendentes = [], []
+    for t in lista:
+        d = listagem.get(t)
+        if d and all(d.get(c) is not None for c in CAMPOS_ESSENCIAIS):
+            anterior = CACHE_MEMORIA.get(t) or {}
+            entrada = {**anterior, "dados": mesclar_dados(anterior.get("dados"), d), "timestamp": agora}
+            CACHE_MEMORIA[t] = entrada
+            # Data Com do ciclo anterior: a página individual completa os campos que a listagem não tem
+            if precisa_pagina(entrada, agora): pendentes.append(t)
+            else: atualizados.append((t, agora, d))
+        else:
+            pendentes.append(t)
+    return atualizados, pendentes
+
+async def atualizar_cache_job(lista=None):
+    if lista is None: lista = await no_backend(lambda: list(CACHE_MEMORIA.keys()))
     if not lista: return
     logger.info(f"🔄 Atualizando {len(lista)} fundos...")
-    for t in lista:
-        d = scrape_dados(t)
+
+    atualizados = []
+    pendentes = lista
+    if MODO_BULK and len(lista) >= LIMIAR_BULK:
+        listagem = await scrape_listagem()
+        atualizados, pendentes = await no_backend(aplicar_listagem, lista, listagem, time.time())
+        logger.info(f"📋 Listagem cobriu {len(atualizados)} fundos; {len(pendentes)} via página individual")
+
+    renovado = time.monotonic()
+    for t in pendentes:
+        if time.monotonic() - renovado >= RENOVACAO_LEASE:
+            # Job mais longo que o lease: renova; se outro worker assumiu, para aqui
+            if not await asyncio.to_thread(lideranca.tentar, LEASE_LIDER):
+                logger.warning("Lease de líder perdido no meio do job; interrompendo")
+                break
+            renovado = time.monotonic()
+        d = await scrape_dados(t)
         if d:
-            CACHE_MEMORIA[t] = {"dados": d, "timestamp": time.time()}
-        time.sleep(2)
+            agora = time.time()
+            await no_backend(CACHE_MEMORIA.__setitem__, t, {"dados": d, "timestamp": agora, "pagina": agora})
+            atualizados.append((t, agora, d))
+        await asyncio.sleep(PAUSA_ENTRE_FUNDOS)
+
+    await registrar_historico(atualizados)
+
+async def registrar_historico(linhas):
+    if historico is None or not linhas: return
+    try:
+        await asyncio.to_thread(historico.registrar_lote, linhas)
+    except Exception as e:
+        logger.error(f"Erro ao gravar histórico: {e}")
+
+ESTADO_AGENDADOR = _criar_mapa("estado")
+
+async def ciclo_agendador(agora=None):
+    agora = agora or time.time()
+    await gravar_acessos()  # o líder decide com as leituras deste processo também
+    await no_backend(descartar_inativos, agora)
+    momento = agora_b3(agora)
+    fase = fase_mercado(momento)
+    if fase == "pregao":
+        vencidos = await no_backend(selecionar_vencidos, agora)
+        if vencidos: await atualizar_cache_job(vencidos)
+    elif fase == "pos" and await no_backend(ESTADO_AGENDADOR.get, "ultima_consolidacao") != momento.date().isoformat():
+        # Fechamento do dia: todo o cache uma única vez
+        logger.info("🏁 Consolidação pós-fechamento")
+        await no_backend(ESTADO_AGENDADOR.__setitem__, "ultima_consolidacao", momento.date().isoformat())
+        await atualizar_cache_job()
+
+async def loop_atualizacao():
+    while True:
+        await asyncio.sleep(TICK_AGENDADOR)
+        try:
+            # Com vários workers, só o dono do lease agenda refreshes
+            if await asyncio.to_thread(lideranca.tentar, LEASE_LIDER):
+                await ciclo_agendador()
+        except Exception as e:
+            logger.error(f"Erro na atualização agendada: {e}")
+
+# Consultas "live" simultâneas do mesmo ticker compartilham um único scrape
+_EM_ANDAMENTO = {}
+
+async def buscar_live(ticker: str):
+    tarefa = _EM_ANDAMENTO.get(ticker)
+    if tarefa is None:
+        tarefa = asyncio.ensure_future(scrape_dados(ticker))
+        _EM_ANDAMENTO[ticker] = tarefa
+        tarefa.add_done_callback(lambda _: _EM_ANDAMENTO.pop(ticker, None))
+    return await tarefa
 
 # --- APP ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(atualizar_cache_job, 'interval', hours=6)
-    scheduler.start()
+    global http_client, historico
+    http_client = create_client()
+    historico = HistoricoStore(HISTORICO_DB)
+    jobs = [asyncio.create_task(loop_atualizacao()), asyncio.create_task(loop_acessos())]
     yield
-    scheduler.shutdown()
+    for job in jobs:
+        job.cancel()
+        try: await job
+        except asyncio.CancelledError: pass
+    await gravar_acessos()
+    await http_client.aclose()
+    historico.close()
+    lideranca.liberar()
+
+app = FastAPI(lifespan=lifespan, default_response_class=RespostaJSON)
+
+# --- CACHE HTTP (ETag / Cache-Control) ---
+def ttl_restante(ticker, timestamp, agora):
+    intervalo = intervalo_refresh(ticker, agora) if fase_mercado(agora_b3(agora)) == "pregao" else None
+    if intervalo is None: intervalo = MAX_AGE_FORA_PREGAO
+    return max(0, int(intervalo - (agora - timestamp)))
 
-app = FastAPI(lifespan=lifespan)
+def cabecalhos_cache(ticker, timestamp, agora):
+    return {
+        "ETag": f'W/"{ticker}-{int(timestamp * 1000)}"',
+        "Cache-Control": f"public, max-age={ttl_restante(ticker, timestamp, agora)}",
+    }
+
+def etag_confere(if_none_match, etag):
+    if not if_none_match: return False
+    candidatos = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidatos or etag in candidatos
 
 @app.get("/")
-def home():
-    return {"status": "online", "fundos": len(CACHE_MEMORIA)}
+async def home():
+    return {"status": "online", "fundos": await no_backend(len, CACHE_MEMORIA), "backend": CACHE_BACKEND}
 
 @app.get("/dados/{ticker}")
-def get_dados(ticker: str):
+async def get_dados(ticker: str, if_none_match: Optional[str] = Header(None)):
     ticker = ticker.upper().strip()
+    agora = time.time()
+    registrar_acesso(ticker, agora)
     
     # Cache Check
-    if ticker in CACHE_MEMORIA:
-        return {"ticker": ticker, **CACHE_MEMORIA[ticker]["dados"], "source": "cache"}
+    entrada = await no_backend(CACHE_MEMORIA.get, ticker)
+    if entrada:
+        headers = await no_backend(cabecalhos_cache, ticker, entrada["timestamp"], agora)
+        if etag_confere(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return RespostaJSON({"ticker": ticker, **entrada["dados"], "source": "cache"}, headers=headers)
     
     # Live Check
-    d = scrape_dados(ticker)
+    d = await buscar_live(ticker)
     if d:
-        CACHE_MEMORIA[ticker] = {"dados": d, "timestamp": time.time()}
-        return {"ticker": ticker, **d, "source": "live"}
+        agora = time.time()
+        await no_backend(CACHE_MEMORIA.__setitem__, ticker, {"dados": d, "timestamp": agora, "pagina": agora})
+        await registrar_historico([(ticker, agora, d)])
+        return RespostaJSON({"ticker": ticker, **d, "source": "live"}, headers=await no_backend(cabecalhos_cache, ticker, agora, agora))
     
-    raise HTTPException(404, detail="Nao encontrado")
\ No newline at end of file
+    _ACESSOS_PENDENTES.pop(ticker, None)
+    await no_backend(ACESSOS.pop, ticker, None)
+    raise HTTPException(404, detail="Nao encontrado")
+
+@app.get("/historico/{ticker}")
+async def get_historico(ticker: str, inicio: Optional[float] = None, fim: Optional[float] = None, pontos: int = Query(500, ge=1, le=HISTORICO_MAX_PONTOS), campos: Optional[str] = Query(None, description="Lista separada por vírgula")):
+    ticker = ticker.upper().strip()
+    lista_campos = [c.strip().lower() for c in campos.split(",")] if campos else CAMPOS_HISTORICO
+    invalidos = [c for c in lista_campos if c not in CAMPOS_HISTORICO]
+    if invalidos:
+        raise HTTPException(400, detail=f"Campos invalidos: {', '.join(invalidos)}")
+    serie = await asyncio.to_thread(historico.consultar, ticker, inicio, fim, pontos, lista_campos)
+    if not serie:
+        raise HTTPException(404, detail="Sem historico")
+    return {"ticker": ticker, "campos": list(lista_campos), "pontos": serie}
+
+# --- EXPORTAÇÃO (STREAMING) ---
+COLUNAS_EXPORT = ("ticker", "timestamp") + CAMPOS_DADOS
+EXPORT_LOTE_PARQUET = 1000
+
+def iterar_cache(tickers=None, desde=None):
+    # Snapshot só das chaves; cada entrada é lida sob demanda para manter a memória constante
+    chaves = tickers if tickers is not None else list(CACHE_MEMORIA.keys())
+    for t in chaves:
+        entrada = CACHE_MEMORIA.get(t)
+        if not entrada: continue
+        if desde is not None and entrada["timestamp"] < desde: continue
+        dados = entrada["dados"]
+        yield {"ticker": t, "timestamp": entrada["timestamp"], **{c: dados.get(c) for c in CAMPOS_DADOS}}
+
+def gerar_ndjson(linhas):
+    for linha in linhas:
+        if orjson: yield orjson.dumps(linha) + b"\n"
+        else: yield json.dumps(linha, ensure_ascii=False) + "\n"
+
+def gerar_csv(linhas):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUNAS_EXPORT)
+    for linha in linhas:
+        writer.writerow([linha[c] for c in COLUNAS_EXPORT])
+        yield buf.getvalue()
+        buf.seek(0); buf.truncate()
+    if buf.tell(): yield buf.getvalue()
+
+class _SinkStreaming(io.RawIOBase):
+    """Destino de escrita que acumula só o trecho ainda não enviado ao cliente."""
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+    def writable(self): return True
+    def write(self, b):
+        self.partes.append(bytes(b)); self.posicao += len(b)
+        return len(b)
+    def tell(self): return self.posicao
+    def drenar(self):
+        bloco = b"".join(self.partes); self.partes = []
+        return bloco
+
+def gerar_parquet(linhas):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("ticker", pa.string()), ("timestamp", pa.float64())] + [(c, pa.string() if c in CAMPOS_TEXTO else pa.float64()) for c in CAMPOS_DADOS])
+    sink = _SinkStreaming()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def escrever(lote):
+        writer.write_table(pa.Table.from_pylist(lote, schema=schema))
+        return sink.drenar()
+
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= EXPORT_LOTE_PARQUET:
+            yield escrever(lote); lote = []
+    if lote: yield escrever(lote)
+    writer.close()
+    yield sink.drenar()
+
+# Compressão em streaming (parquet já sai comprimido e não passa por aqui)
+def escolher_encoding(accept_encoding):
+    aceitos = {p.split(";")[0].strip().lower() for p in (accept_encoding or "").split(",")}
+    if brotli and "br" in aceitos: return "br"
+    if "gzip" in aceitos: return "gzip"
+    return None
+
+def comprimir_stream(blocos, encoding):
+    if encoding == "br":
+        comp = brotli.Compressor(quality=5)
+        processar, finalizar = comp.process, comp.finish
+    else:
+        comp = zlib.compressobj(6, zlib.DEFLATED, 31)
+        processar, finalizar = comp.compress, comp.flush
+    for bloco in blocos:
+        saida = processar(bloco.encode("utf-8") if isinstance(bloco, str) else bloco)
+        if saida: yield saida
+    yield finalizar()
+
+FORMATOS_EXPORT = {
+    "ndjson": (gerar_ndjson, "application/x-ndjson"),
+    "csv": (gerar_csv, "text/csv; charset=utf-8"),
+    "parquet": (gerar_parquet, "application/vnd.apache.parquet"),
+}
+
+@app.get("/export")
+def exportar(formato: str = "ndjson", tickers: Optional[str] = Query(None, description="Lista separada por vírgula"), desde: Optional[float] = Query(None, description="Timestamp mínimo (epoch)"), accept_encoding: Optional[str] = Header(None)):
+    formato = formato.lower().strip()
+    if formato not in FORMATOS_EXPORT:
+        raise HTTPException(400, detail=f"Formato invalido. Use: {', '.join(FORMATOS_EXPORT)}")
+    if formato == "parquet":
+        try: import pyarrow  # noqa: F401
+        except ImportError: raise HTTPException(501, detail="Parquet indisponivel (instale pyarrow)")
+
+    lista = None
+    if tickers:
+        lista = list(dict.fromkeys(t.upper().strip() for t in tickers.split(",") if t.strip()))
+
+    gerador, media_type = FORMATOS_EXPORT[formato]
+    headers = {"Content-Disposition": f'attachment; filename="fiis.{formato}"', "Vary": "Accept-Encoding"}
+    corpo = gerador(iterar_cache(lista, desde))
+    encoding = escolher_encoding(accept_encoding) if formato != "parquet" else None
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        corpo = comprimir_stream(corpo, encoding)
+    return StreamingResponse(corpo, media_type=media_type, headers=headers)
@@ -0,0 +1,106 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Instrumentação leve por etapa: cada execução (rerun do Streamlit, rodada do
+# relatório) abre um Cronometro; etapas e funções decoradas registram nele.
+
+logger = logging.getLogger("carteira.medicao")
+
+_local = threading.local()
+
+
+class Cronometro:
+    def __init__(self, nome="execucao"):
+        self.nome = nome
+        self.inicio = time.perf_counter()
+        self.registros = []
+        self.nivel = 0
+        self.total_ms = None
+
+    def finalizar(self):
+        self.total_ms = (time.perf_counter() - self.inicio) * 1000
+        return self
+
+    def resumo(self):
+        partes = [f"{self.nome} {self.total_ms or 0:.0f}ms"]
+        for r in self.registros:
+            cache = f" ({r['cache']})" if r["cache"] else ""
+            partes.append(f"{'  ' * r['nivel']}{r['etapa']} {r['ms']:.0f}ms{cache}")
+        return " | ".join(partes)
+
+
+def iniciar(nome="execucao"):
+    _local.atual = Cronometro(nome)
+    return _local.atual
+
+
+def atual():
+    return getattr(_local, "atual", None)
+
+
+def finalizar(log=True):
+    crono = atual()
+    if crono is None: return None
+    crono.finalizar()
+    _local.atual = None
+    if log: logger.info(crono.resumo())
+    return crono
+
+
+@contextmanager
+def etapa(nome, crono=None):
+    """Com `crono` explícito a etapa roda em outra thread: entra no nível de cima, sem aninhar."""
+    paralela = crono is not None
+    crono = crono or atual()
+    registro = {"etapa": nome, "ms": 0.0, "cache": None, "nivel": crono.nivel if crono and not paralela else 0}
+    if crono:
+        crono.registros.append(registro)
+        if not paralela: crono.nivel += 1
+    t0 = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["ms"] = (time.perf_counter() - t0) * 1000
+        if crono and not paralela: crono.nivel -= 1
+
+
+def cronometrar(nome=None, cache=None):
+    """Decorator de etapa. Com `cache` (ex.: st.cache_data(ttl=60)) a função é
+    cacheada por ele e o registro marca hit/miss conforme o corpo rodou ou não."""
+    def deco(fn):
+        rotulo = nome or fn.__name__
+        estado = threading.local()
+
+        @functools.wraps(fn)
+        def corpo(*args, **kwargs):
+            estado.executou = True
+            return fn(*args, **kwargs)
+
+        alvo = cache(corpo) if cache else corpo
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            estado.executou = False
+            with etapa(rotulo) as registro:
+                resultado = alvo(*args, **kwargs)
+            if cache: registro["cache"] = "miss" if estado.executou else "hit"
+            return resultado
+
+        if hasattr(alvo, "clear"): wrapper.clear = alvo.clear
+        return wrapper
+    return deco
+
+
+def agregar(execucoes):
+    """Estatística por etapa sobre várias execuções: [(etapa, media_ms, max_ms, n, hits)]"""
+    acumulado = {}
+    for crono in execucoes:
+        for r in crono.registros:
+            item = acumulado.setdefault(r["etapa"], {"soma": 0.0, "max": 0.0, "n": 0, "hits": 0})
+            item["soma"] += r["ms"]; item["max"] = max(item["max"], r["ms"]); item["n"] += 1
+            if r["cache"] == "hit": item["hits"] += 1
+    linhas = [(e, v["soma"] / v["n"], v["max"], v["n"], v["hits"]) for e, v in acumulado.items()]
+    return sorted(linhas, key=lambda x: x[1], reverse=True)
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gravacao  # noqa: E402
+
+
+@pytest.fixture
+def cassetes(tmp_path, monkeypatch):
+    monkeypatch.setattr(gravacao, "MODO", gravacao.MODO)
+    monkeypatch.setattr(gravacao, "PASTA", gravacao.PASTA)
+    gravacao.configurar("gravar", str(tmp_path))
+    rede = {"ok": True, "chamadas": 0}
+
+    @gravacao.cassete("cotacao", gravar_se=lambda preco: preco > 0)
+    def cotacao(ticker):
+        rede["chamadas"] += 1
+        if not rede["ok"]: raise RuntimeError("sem rede")
+        return {"HGLG11": 160.5}.get(ticker, 0.0)  # 0.0 = fallback de ticker desconhecido
+
+    @gravacao.cassete("pagina")
+    async def pagina(ticker):
+        rede["chamadas"] += 1
+        if not rede["ok"]: raise RuntimeError("sem rede")
+        return None if ticker == "XXXX11" else {"ticker": ticker}
+
+    def historico(ticker):
+        rede["chamadas"] += 1
+        if not rede["ok"]: raise RuntimeError("sem rede")
+        return pd.DataFrame() if ticker == "XXXX11" else pd.DataFrame({"Close": [1.0, 2.0]})
+
+    return rede, cotacao, pagina, historico
+
+
+def _sessao(cotacao, pagina, historico):
+    return (cotacao("HGLG11"), cotacao("XXXX11"), asyncio.run(pagina("HGLG11")), asyncio.run(pagina("XXXX11")),
+            gravacao.chamar("yf.download", historico, "HGLG11"), gravacao.chamar("yf.download", historico, "XXXX11"))
+
+
+def test_gravar_e_reproduzir_inclui_falhas(cassetes):
+    rede, cotacao, pagina, historico = cassetes
+    gravado = _sessao(cotacao, pagina, historico)
+
+    gravacao.configurar("reproduzir")
+    rede["ok"], rede["chamadas"] = False, 0
+    reproduzido = _sessao(cotacao, pagina, historico)
+
+    assert rede["chamadas"] == 0
+    assert reproduzido[:4] == gravado[:4] == (160.5, 0.0, {"ticker": "HGLG11"}, None)
+    pd.testing.assert_frame_equal(reproduzido[4], gravado[4])
+    assert reproduzido[5].empty
+
+
+def test_misto_busca_de_novo_so_as_falhas(cassetes):
+    rede, cotacao, pagina, historico = cassetes
+    _sessao(cotacao, pagina, historico)
+
+    gravacao.configurar("misto")
+    rede["chamadas"] = 0
+    assert cotacao("HGLG11") == 160.5 and rede["chamadas"] == 0
+    assert cotacao("XXXX11") == 0.0 and rede["chamadas"] == 1
+
+
+def test_excecao_nao_grava(cassetes):
+    rede, cotacao, _, _ = cassetes
+    rede["ok"] = False
+    with pytest.raises(RuntimeError): cotacao("HGLG11")
+
+    gravacao.configurar("reproduzir")
+    with pytest.raises(gravacao.FixtureAusente): cotacao("HGLG11")